@@ -1,10 +1,22 @@
+import os
+import sys
 from datetime import datetime, timedelta
-from airflow import DAG
-from airflow.operators.python_operator import PythonOperator
+from airflow.decorators import dag, task
+
+# The pipeline code lives in scripts/ next to this folder; override the
+# location with ALPHA_RANK_SCRIPTS_DIR when the DAG is deployed elsewhere.
+SCRIPTS_DIR = os.getenv('ALPHA_RANK_SCRIPTS_DIR',
+                        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.append(SCRIPTS_DIR)
+
+# Each run writes its artifacts under ETL_DATA_DIR/<run_id>. With more than one
+# worker this must be a volume every worker can read and write.
+ETL_DATA_DIR = os.getenv('ETL_DATA_DIR', '/opt/airflow/data/financial_institutions')
 
 # Default arguments that apply to all tasks in the DAG.
 default_args = {
-    'owner': 'airflow',                 
+    'owner': 'airflow',
     'depends_on_past': False,
     'start_date': datetime(2023, 1, 1),
     'email_on_failure': False,
@@ -13,41 +25,169 @@ default_args = {
     'retry_delay': timedelta(minutes=5)  # Time to wait between retries.
 }
 
-# Instantiate the DAG.
-dag = DAG(
+
+def task_report(run_dir: str, ti):
+    """
+    Record a task's stages into its own run report under run_dir/reports.
+
+    The write_run_report task merges these into run_dir/run_report.json.
+    """
+    from instrumentation import pipeline_run
+    suffix = f'_{ti.map_index}' if ti.map_index >= 0 else ''
+    return pipeline_run(ti.task_id, os.path.join(run_dir, 'reports', f'{ti.task_id}{suffix}.json'))
+
+
+# Pipeline modules are imported inside the tasks so parsing this file stays
+# cheap for the scheduler.
+@dag(
     dag_id='financial_institution_etl_dag',
     default_args=default_args,
-    schedule_interval='0 0 1 1,4,7,10 *',  # Run on the day after the last day of each quarter
-
+    schedule='0 0 1 1,4,7,10 *',  # Run on the day after the last day of each quarter
     catchup=False,
+    params={'credit_union_quarters': 1},  # How many recent NCUA cycles to load
 )
+def financial_institution_etl():
 
-get_bank_data = PythonOperator(
-    task_id='get_bank_data',
-    python_callable='/Users/imranmahmood/Projects/alpha-rank-ai/scripts/fetch_data/get_bank_data.py',
-    dag=dag,
-)
+    @task
+    def prepare_run_dir(run_id=None) -> str:
+        """Create the directory this run's artifacts are written to."""
+        run_dir = os.path.join(ETL_DATA_DIR, run_id.replace(':', '_').replace('+', '_'))
+        os.makedirs(run_dir, exist_ok=True)
+        return run_dir
 
-get_credit_union_data = PythonOperator(
-    task_id='get_credit_union_data',
-    python_callable='/Users/imranmahmood/Projects/alpha-rank-ai/scripts/fetch_data/get_credit_union_data.py',
-    dag=dag,
-)
+    # Banks: one mapped task per API page
 
-transform_credit_union_data = PythonOperator(
-    task_id='transform_credit_union_data',
-    python_callable='/Users/imranmahmood/Projects/alpha-rank-ai/scripts/transform_data/transform_credit_union_data.py',
-    dag=dag,
-)
+    @task
+    def bank_page_offsets(dataset: str, run_dir: str, ti=None) -> list:
+        from fetch_data.get_bank_data import get_page_offsets
+        with task_report(run_dir, ti):
+            return get_page_offsets(dataset)
 
-transform_bank_data = PythonOperator(
-    task_id='transform_bank_data',
-    python_callable='/Users/imranmahmood/Projects/alpha-rank-ai/scripts/transform_data/transform_bank_data.py',
-    dag=dag,
-)
+    @task(max_active_tis_per_dag=8)  # Stay polite to the FDIC API
+    def fetch_bank_page(dataset: str, offset: int, run_dir: str, ti=None) -> str:
+        from fetch_data.get_bank_data import fetch_bank_page as fetch_page
+        with task_report(run_dir, ti):
+            return fetch_page(dataset, offset, run_dir)
 
-load_data = PythonOperator(
-    task_id='load_data',
-    python_callable='/Users/imranmahmood/Projects/alpha-rank-ai/scripts/load_data/write_to_table.py',
-    dag=dag,
-)
+    @task
+    def combine_bank_pages(page_paths: list, file_name: str, run_dir: str, ti=None) -> str:
+        from fetch_data.get_bank_data import combine_bank_pages as combine_pages
+        with task_report(run_dir, ti):
+            return combine_pages(list(page_paths), os.path.join(run_dir, file_name))
+
+    @task
+    def transform_bank_data(bank_dim_path: str, bank_fact_path: str, run_dir: str,
+                            ts_nodash=None, ti=None) -> dict:
+        from transform_data.transform_bank_data import transform_bank_files
+        with task_report(run_dir, ti):
+            return transform_bank_files(bank_dim_path, bank_fact_path, run_dir, ts_nodash)
+
+    @task
+    def load_bank_data(formatted: dict, run_dir: str, ti=None):
+        from transform_data.transform_bank_data import load_bank_files_to_staging
+        with task_report(run_dir, ti):
+            load_bank_files_to_staging(formatted)
+
+    @task
+    def merge_bank_data(run_dir: str, ti=None):
+        from load_data import write_to_table
+        with task_report(run_dir, ti):
+            write_to_table.fact_banks_merge_staging_to_main()
+            write_to_table.dim_banks_merge_staging_to_main()
+
+    # Credit unions: one mapped task per NCUA call report cycle
+
+    @task
+    def credit_union_cycles(data_interval_end=None, params=None) -> list:
+        """List the most recent completed quarters as {'month', 'year'} cycles."""
+        year, month = data_interval_end.year, data_interval_end.month
+        cycles = []
+        for _ in range(params['credit_union_quarters']):
+            # Step back to the end of the previous quarter
+            month = (month - 1) // 3 * 3
+            if month == 0:
+                year, month = year - 1, 12
+            cycles.append({'month': f'{month:02d}', 'year': str(year)})
+        return cycles
+
+    @task(max_active_tis_per_dag=2)  # Each cycle drives a browser
+    def fetch_credit_union_cycle(cycle: dict, run_dir: str, ti=None) -> dict:
+        from fetch_data.get_credit_union_data import fetch_credit_union_cycle as fetch_cycle
+        with task_report(run_dir, ti):
+            return fetch_cycle(cycle['month'], cycle['year'], run_dir)
+
+    @task
+    def combine_credit_union_cycles(cycle_files: list, run_dir: str, ti=None) -> dict:
+        from fetch_data.get_credit_union_data import combine_credit_union_cycles as combine_cycles
+        with task_report(run_dir, ti):
+            return combine_cycles(list(cycle_files), run_dir)
+
+    @task
+    def transform_credit_union_data(cu_files: dict, run_dir: str, ts_nodash=None, ti=None) -> dict:
+        from transform_data.transform_cu_data import transform_cu_files
+        with task_report(run_dir, ti):
+            return transform_cu_files(cu_files['dim'], cu_files['fact'], run_dir, ts_nodash)
+
+    @task
+    def load_credit_union_data(formatted: dict, run_dir: str, ti=None):
+        from transform_data.transform_cu_data import load_cu_files_to_staging
+        with task_report(run_dir, ti):
+            load_cu_files_to_staging(formatted)
+
+    @task
+    def merge_credit_union_data(run_dir: str, ti=None):
+        from load_data import write_to_table
+        with task_report(run_dir, ti):
+            write_to_table.fact_credit_unions_merge_staging_to_main()
+            write_to_table.dim_credit_unions_merge_staging_to_main()
+
+    # Post-merge
+
+    @task
+    def build_summary_tables(run_dir: str, ti=None):
+        from load_data import write_to_table
+        with task_report(run_dir, ti):
+            write_to_table.asset_tier_summary_to_table()
+            write_to_table.state_summary_to_table()
+            write_to_table.institution_count_summary_to_table()
+
+    @task
+    def publish_schema_snapshot(run_dir: str, ti=None):
+        from load_data.schema_snapshot import refresh_schema_snapshot
+        from load_data.write_to_table import get_client
+        with task_report(run_dir, ti):
+            refresh_schema_snapshot(get_client())
+
+    @task(trigger_rule='all_done')  # Report on failed runs too
+    def write_run_report(run_dir: str) -> str:
+        from instrumentation import merge_run_reports
+        report_path = os.path.join(run_dir, 'run_report.json')
+        merge_run_reports(os.path.join(run_dir, 'reports'), report_path)
+        return report_path
+
+    run_dir = prepare_run_dir()
+
+    # fetch -> transform -> load -> merge, banks
+    bank_dim_pages = fetch_bank_page.partial(dataset='institutions', run_dir=run_dir) \
+        .expand(offset=bank_page_offsets.override(task_id='bank_dim_page_offsets')('institutions', run_dir))
+    bank_fact_pages = fetch_bank_page.partial(dataset='financials', run_dir=run_dir) \
+        .expand(offset=bank_page_offsets.override(task_id='bank_fact_page_offsets')('financials', run_dir))
+    bank_dim_file = combine_bank_pages.override(task_id='combine_bank_dim_pages')(
+        bank_dim_pages, 'bank_dim_data.csv', run_dir)
+    bank_fact_file = combine_bank_pages.override(task_id='combine_bank_fact_pages')(
+        bank_fact_pages, 'bank_fact_data.csv', run_dir)
+    banks_merged = merge_bank_data(run_dir)
+    load_bank_data(transform_bank_data(bank_dim_file, bank_fact_file, run_dir), run_dir) >> banks_merged
+
+    # fetch -> transform -> load -> merge, credit unions
+    cu_cycle_files = fetch_credit_union_cycle.partial(run_dir=run_dir) \
+        .expand(cycle=credit_union_cycles())
+    cu_files = combine_credit_union_cycles(cu_cycle_files, run_dir)
+    credit_unions_merged = merge_credit_union_data(run_dir)
+    load_credit_union_data(transform_credit_union_data(cu_files, run_dir), run_dir) >> credit_unions_merged
+
+    [banks_merged, credit_unions_merged] >> build_summary_tables(run_dir) \
+        >> publish_schema_snapshot(run_dir) >> write_run_report(run_dir)
+
+
+financial_institution_etl()
@@ -1,55 +1,393 @@
-# Ensure you are using the correct imports
-from langchain.chat_models import ChatOpenAI
-from langchain_experimental.sql import SQLDatabaseChain
-from langchain.sql_database import SQLDatabase
-from google.cloud import bigquery
+from functools import lru_cache
 from pydantic import BaseModel
 from fastapi import FastAPI, HTTPException
+from query_cache import QueryCache, normalize_question
+from query_executor import AsyncQueryExecutor
+from schema_snapshot import load_schema_snapshot, render_table_info
+from fast_path import route_question
+from cost_guard import CostGuard, QueryRejectedError
+from result_pages import RESULT_RETENTION_SECONDS, decode_cursor, fetch_page
+from name_index import NameIndex
+import asyncio
 import os
 import json
+import time
 
 # Initialize FastAPI
 app = FastAPI()
 
-client = bigquery.Client()
+BIGQUERY_URI = "bigquery://alpha-rank-ai/financial_institutions"
+DATASET_ID = "alpha-rank-ai.financial_institutions"
+MAIN_TABLES = ["fact_banks", "dim_banks", "fact_credit_unions", "dim_credit_unions"]
+# Published by scripts/load_data/write_to_table.py after every ETL run
+SCHEMA_SNAPSHOT_URI = os.getenv("SCHEMA_SNAPSHOT_URI",
+                                "gs://alpha-rank-ai-bucket/schema/schema_snapshot.json")
+SCHEMA_RELOAD_SECONDS = float(os.getenv("DATA_VERSION_CHECK_SECONDS", "300"))
+# Where the ETL leaves the formatted_*_dim_data files: gs://bucket or a local dir
+NAME_INDEX_SOURCE = os.getenv("NAME_INDEX_SOURCE", "gs://alpha-rank-ai-bucket")
+_schema_loaded_at = 0.0
+_name_index_failed_at = None
 
+# Results are returned in pages of this many rows; clients may ask for fewer
+# or more, up to the maximum.
+RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "500"))
+RESULT_MAX_PAGE_SIZE = int(os.getenv("RESULT_MAX_PAGE_SIZE", "5000"))
 
-# Initialize OpenAI LLM with explicit instructions
-llm = ChatOpenAI(model_name="gpt-4", temperature=0.0)  # Set temperature to 0 for deterministic responses
+# Answers are cached per question until they expire, get evicted, or the ETL
+# loads a new quarter into the main tables. Cached answers point at BigQuery
+# result tables, so they cannot outlive those tables.
+query_cache = QueryCache(
+    max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512")),
+    ttl_seconds=min(float(os.getenv("QUERY_CACHE_TTL_SECONDS", str(RESULT_RETENTION_SECONDS))),
+                    RESULT_RETENTION_SECONDS),
+    version_check_seconds=float(os.getenv("DATA_VERSION_CHECK_SECONDS", "300")),
+)
 
-# Connect to BigQuery
-db = SQLDatabase.from_uri("bigquery://alpha-rank-ai/financial_institutions")
+# Blocking LLM and BigQuery work runs on a bounded pool so slow questions
+# cannot exhaust the server's threadpool or stall the event loop.
+query_executor = AsyncQueryExecutor(
+    max_concurrency=int(os.getenv("QUERY_MAX_CONCURRENCY", "8")),
+    timeout_seconds=float(os.getenv("QUERY_TIMEOUT_SECONDS", "120")),
+)
 
-# Create SQL generation chain with STRICT instructions
-query_chain = SQLDatabaseChain.from_llm(
-    llm,
-    db,
-    verbose=True,
-    return_direct=False
+# Every query is dry-run first; expensive ones are narrowed or rejected.
+cost_guard = CostGuard(
+    max_bytes=int(os.getenv("QUERY_MAX_BYTES", str(1024 ** 3))),
+    max_rows=int(os.getenv("QUERY_MAX_ROWS", "10000")),
+    quarter_check_seconds=float(os.getenv("DATA_VERSION_CHECK_SECONDS", "300")),
 )
 
 
-def format_results(bigquery_results):
-    """Format BigQuery query output into a structured dictionary."""
-    if not bigquery_results:
-        return []
+# Clients are created on first use and cached for the life of the process.
+# LangChain and the BigQuery SDK are imported inside the factories because
+# they dominate import time; keeping them out of module scope lets uvicorn
+# bind its port (and Cloud Run finish a cold start) before any of them load.
+@lru_cache(maxsize=None)
+def get_bigquery_client():
+    """Return the shared BigQuery client."""
+    from google.cloud import bigquery
+
+    return bigquery.Client()
+
+
+@lru_cache(maxsize=None)
+def get_name_index():
+    """
+    Return the institution name index built from the latest dimension files.
+
+    If the files cannot be read the index is empty, so questions are still
+    answered (without institution hints); refresh_name_index retries later.
+    """
+    global _name_index_failed_at
+    try:
+        index = NameIndex.from_latest_files(NAME_INDEX_SOURCE)
+    except Exception as e:
+        print(f"Warning: could not build name index from {NAME_INDEX_SOURCE}: {e}")
+        _name_index_failed_at = time.time()
+        return NameIndex([])
+    _name_index_failed_at = None
+    return index
+
+
+@lru_cache(maxsize=None)
+def get_llm():
+    """Return the shared OpenAI chat model."""
+    from langchain.chat_models import ChatOpenAI
+
+    # Set temperature to 0 for deterministic responses
+    return ChatOpenAI(model_name="gpt-4", temperature=0.0)
+
+
+@lru_cache(maxsize=None)
+def get_schema_snapshot():
+    """Return the schema snapshot published by the ETL, or None if unavailable."""
+    global _schema_loaded_at
+    _schema_loaded_at = time.time()
+    return load_schema_snapshot(SCHEMA_SNAPSHOT_URI)
+
+
+@lru_cache(maxsize=None)
+def get_db():
+    """
+    Return the SQLDatabase wrapper.
+
+    With a schema snapshot the prompt's table info comes from the snapshot, so
+    no sample-row queries run per request and table reflection is deferred.
+    Without one, fall back to reflecting the whole dataset.
+    """
+    from langchain.sql_database import SQLDatabase
+
+    snapshot = get_schema_snapshot()
+    if snapshot is None:
+        return SQLDatabase.from_uri(BIGQUERY_URI)
+    return SQLDatabase.from_uri(
+        BIGQUERY_URI,
+        include_tables=list(snapshot["tables"]),
+        custom_table_info=render_table_info(snapshot),
+        sample_rows_in_table_info=0,
+        lazy_table_reflection=True,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_query_chain():
+    """
+    Return the SQL generation chain built on the shared LLM and database.
+
+    The chain only generates SQL; the backend runs it itself so every query
+    passes through the cost guard first.
+    """
+    from langchain_experimental.sql import SQLDatabaseChain
+
+    return SQLDatabaseChain.from_llm(
+        get_llm(),
+        get_db(),
+        verbose=True,
+        return_sql=True
+    )
+
+
+def get_data_version():
+    """
+    Identify the data currently loaded in the main tables.
+
+    Uses table metadata only (no query is run), so it is free to call. The
+    version changes whenever the ETL merges a new quarter into any table.
+
+    Returns:
+        str: Latest modification time across the main tables.
+    """
+    client = get_bigquery_client()
+    modified = [client.get_table(f"{DATASET_ID}.{table}").modified
+                for table in MAIN_TABLES]
+    return max(modified).isoformat()
+
+
+def refresh_schema_snapshot():
+    """
+    Reload the schema snapshot once the ETL has published one for new data.
+
+    Reloads are throttled because the ETL publishes the snapshot only after
+    it finishes merging, which can be some time after the tables change.
+    """
+    snapshot = get_schema_snapshot()
+    current_version = query_cache.data_version
+    if current_version is None or (snapshot and snapshot["data_version"] == current_version):
+        return
+    if time.time() - _schema_loaded_at < SCHEMA_RELOAD_SECONDS:
+        return
+    get_schema_snapshot.cache_clear()
+    get_db.cache_clear()
+    get_query_chain.cache_clear()
+
+
+def refresh_name_index():
+    """Retry building the name index after a failure, at most every SCHEMA_RELOAD_SECONDS."""
+    if _name_index_failed_at is not None and time.time() - _name_index_failed_at >= SCHEMA_RELOAD_SECONDS:
+        get_name_index.cache_clear()
+
+
+def clean_sql(generated: str) -> str:
+    """Strip the prompt labels and markdown fences the LLM sometimes adds."""
+    sql = generated.split("SQLResult:")[0]
+    sql = sql.split("SQLQuery:")[-1]
+    return sql.strip().strip("`").removeprefix("sql").strip()
+
+
+def add_institution_hints(question: str) -> str:
+    """
+    Append the charter_ids of institutions named in a question.
+
+    This lets the generated SQL filter on charter_id instead of scanning the
+    dimension tables with LIKE on the name.
+    """
+    mentions = get_name_index().resolve(question)
+    if not mentions:
+        return question
+    hints = []
+    for mention in mentions:
+        matches = ", ".join(
+            f"{match['institution_type']} charter_id {match['charter_id']} "
+            f"({match['name']}, {match['city']}, {match['state']})"
+            for match in mention["matches"])
+        hints.append(f'"{mention["mention"]}" refers to {matches}')
+    return f"{question}\n(Resolved institutions: {'; '.join(hints)}.)"
 
-    column_names = [field.name for field in bigquery_results.schema]
-    return [dict(zip(column_names, row)) for row in bigquery_results]
+
+def run_query(sql: str) -> tuple:
+    """
+    Run a query through the cost guard and wait for it to finish.
+
+    Args:
+        sql (str): Query to run.
+
+    Returns:
+        tuple: (the SQL actually executed, the finished query job, cost record)
+
+    Raises:
+        QueryRejectedError: If the cost guard rejects the query.
+    """
+    client = get_bigquery_client()
+    prepared = cost_guard.prepare(client, sql)
+    job = client.query(prepared["sql"])
+    job.result()  # Wait for the job to complete
+    return prepared["sql"], job, cost_guard.record(prepared, job)
+
+
+def narrowing_notice(cost: dict):
+    """Tell the user when the cost guard narrowed their query to one quarter."""
+    if not cost.get("narrowed_to"):
+        return None
+    year, month = cost["narrowed_to"]
+    return (f"This question would scan more data than allowed, so the results only "
+            f"cover the latest quarter (Q{month // 3} {year}).")
+
+
+def clamp_page_size(page_size) -> int:
+    """Return the requested page size bounded to [1, RESULT_MAX_PAGE_SIZE]."""
+    return max(1, min(page_size or RESULT_PAGE_SIZE, RESULT_MAX_PAGE_SIZE))
+
+
+def answer_question(question: str, page_size: int = RESULT_PAGE_SIZE) -> dict:
+    """
+    Answer a question from the summary tables, the cache, or the LLM.
+
+    Common analytical questions are answered straight from the precomputed
+    summary tables. Everything else is served from the cache, or generated by
+    the SQL chain and run on a miss.
+
+    Args:
+        question (str): Natural-language question about the data.
+        page_size (int): Number of rows in the first page of results.
+
+    Returns:
+        dict: The question, the SQL that answered it, the first page of
+        results, whether the answer came from the cache, its source
+        ("summary" or "llm") and a "notice" if the query was narrowed.
+    """
+    start = time.perf_counter()
+    if query_cache.sync_data_version(get_data_version):
+        # New data means new dimension files; rebuild the index on next use
+        get_name_index.cache_clear()
+    refresh_schema_snapshot()
+    refresh_name_index()
+
+    summary_sql = route_question(question)
+    if summary_sql is not None:
+        sql, job, cost = run_query(summary_sql)
+        return {"query": question, "sql": sql,
+                "results": fetch_page(job, 0, page_size),
+                "cached": False, "source": "summary", "cost": cost,
+                "notice": narrowing_notice(cost)}
+
+    cached = query_cache.get(question)
+    if cached is not None:
+        try:
+            job = get_bigquery_client().get_job(cached["result"]["job_id"],
+                                                location=cached["result"]["location"])
+            page = fetch_page(job, 0, page_size)
+            query_cache.record_latency(True, time.perf_counter() - start)
+            return {"query": question, "sql": cached["sql"], "results": page,
+                    "cached": True, "source": "llm", "notice": cached["result"].get("notice")}
+        except Exception as e:
+            # The result table has expired; answer the question again as a miss
+            print(f"Cached results unavailable, re-running question: {e}")
+            query_cache.discard(question)
+
+    output = get_query_chain().invoke({"query": add_institution_hints(question)})
+    sql, job, cost = run_query(clean_sql(output["result"]))
+    notice = narrowing_notice(cost)
+    query_cache.put(question, sql, {"job_id": job.job_id, "location": job.location,
+                                    "notice": notice})
+    query_cache.record_latency(False, time.perf_counter() - start)
+    return {"query": question, "sql": sql,
+            "results": fetch_page(job, 0, page_size),
+            "cached": False, "source": "llm", "cost": cost, "notice": notice}
 
 
 class QueryRequest(BaseModel):
     question: str
+    page_size: int = RESULT_PAGE_SIZE
 
 # Add both route patterns so they both point to the same function.
 @app.post("/query", include_in_schema=False)
 @app.post("/query/")
-def generate_sql(request: QueryRequest):
+async def generate_sql(request: QueryRequest):
     try:
         print(f"Received Request: {request}")
-        # Generate and execute SQL query using LangChain (your logic)
-        raw_results = query_chain.run(request.question)
-        return {"query": request.question, "results": raw_results}
+        # Serve from the cache, or generate and execute SQL using LangChain.
+        # Identical questions already in flight share a single execution.
+        page_size = clamp_page_size(request.page_size)
+        return await query_executor.run(f"{page_size}:{normalize_question(request.question)}",
+                                        answer_question, request.question, page_size)
+    except asyncio.TimeoutError:
+        print(f"Query timed out: {request.question}")
+        raise HTTPException(status_code=504, detail="Query timed out.")
+    except QueryRejectedError as e:
+        print(f"Query rejected: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error executing query: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/results")
+def get_results_page(cursor: str, page_size: int = RESULT_PAGE_SIZE):
+    """Return the page of a previous answer's results that a cursor points to."""
+    try:
+        job_id, location, offset = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        job = get_bigquery_client().get_job(job_id, location=location)
+        return fetch_page(job, offset, clamp_page_size(page_size))
+    except Exception as e:
+        print(f"Error fetching results page: {e}")
+        raise HTTPException(status_code=404, detail="Results are no longer available.")
+
+
+@app.get("/institutions/search")
+def search_institutions(q: str, state: str = None, city: str = None,
+                        institution_type: str = None, limit: int = 10):
+    """Look up banks and credit unions by (partial) name."""
+    return get_name_index().search(q, state=state, city=city,
+                                   institution_type=institution_type,
+                                   limit=max(1, min(limit, 100)))
+
+
+@app.get("/metrics/cache")
+def cache_metrics():
+    """Expose query cache hit-rate and latency metrics."""
+    return query_cache.stats()
+
+
+@app.on_event("startup")
+def load_schema():
+    # Load the snapshot and name index up front so the first question does
+    # not pay for them
+    get_schema_snapshot()
+    get_name_index()
+
+
+@app.get("/metrics/queries")
+def query_metrics():
+    """Expose query concurrency, deduplication and timeout counters."""
+    return query_executor.stats()
+
+
+@app.get("/metrics/cost")
+def cost_metrics():
+    """Expose estimated vs. actual bytes for recent queries."""
+    return cost_guard.stats()
+
+
+@app.on_event("shutdown")
+def shutdown_query_executor():
+    query_executor.shutdown()
+
+
+@app.post("/cache/invalidate")
+def invalidate_cache():
+    """Drop every cached answer, e.g. right after an ETL run."""
+    query_cache.clear()
+    return {"status": "invalidated"}
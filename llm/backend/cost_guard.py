@@ -0,0 +1,212 @@
+import re
+import threading
+import time
+from collections import deque
+
+DATASET_ID = "alpha-rank-ai.financial_institutions"
+FACT_TABLES = ["fact_banks", "fact_credit_unions"]
+
+# Clauses that can follow a table reference, i.e. words that are not an alias.
+_NOT_ALIAS = {"where", "join", "left", "right", "inner", "full", "cross", "on",
+              "using", "group", "order", "limit", "having", "window", "qualify",
+              "union", "intersect", "except"}
+_FACT_TABLE_REF = re.compile(
+    r"\b(FROM|JOIN)\s+(`?(?:[\w-]+\.)*(" + "|".join(FACT_TABLES) + r")\b`?)"
+    r"(?:\s+(?:AS\s+)?(\w+))?",
+    re.IGNORECASE)
+_TRAILING_LIMIT = re.compile(r"\bLIMIT\s+(\d+)(\s+OFFSET\s+\d+)?\s*$", re.IGNORECASE)
+
+
+class QueryRejectedError(RuntimeError):
+    """Raised when a generated query is not a SELECT or stays over budget."""
+
+
+def add_row_limit(sql: str, max_rows: int) -> str:
+    """
+    Make sure a query returns at most ``max_rows`` rows.
+
+    Appends a LIMIT when the statement has none and lowers an existing
+    trailing LIMIT that is larger than ``max_rows``.
+    """
+    sql = sql.strip().rstrip(";").strip()
+    match = _TRAILING_LIMIT.search(sql)
+    if match is None:
+        return f"{sql}\nLIMIT {max_rows}"
+    if int(match.group(1)) <= max_rows:
+        return sql
+    return sql[:match.start(1)] + str(max_rows) + sql[match.end(1):]
+
+
+def add_latest_quarter_filters(sql: str, year: int, month: int) -> str:
+    """
+    Restrict every fact table reference to one quarter.
+
+    Each reference is replaced by a subquery filtered on literal year/month
+    values, keeping the original alias. Literals (rather than a subquery for
+    the latest quarter) let the dry run and the query prune on them. Queries
+    that already mention ``year`` are left alone since they already pick
+    their own period.
+    """
+    if re.search(r"\byear\b", sql, re.IGNORECASE):
+        return sql
+
+    def replace(match):
+        keyword, table = match.group(1), match.group(3)
+        alias = match.group(4)
+        trailing = ""
+        if alias is None or alias.lower() in _NOT_ALIAS:
+            # No alias: keep the table name usable as a qualifier and put
+            # back the clause keyword we consumed.
+            trailing = f" {alias}" if alias else ""
+            alias = table
+        return (f"{keyword} (SELECT * FROM `{DATASET_ID}.{table}` "
+                f"WHERE year = {int(year)} AND month = {int(month)}) AS {alias}{trailing}")
+
+    return _FACT_TABLE_REF.sub(replace, sql)
+
+
+class CostGuard:
+    """
+    Dry-run generated SQL, enforce a byte budget and bound result size.
+
+    Every query is dry-run first to estimate the bytes it will scan. Queries
+    over budget are narrowed to the latest loaded quarter; if they are still over
+    budget they are rejected. All queries get a row limit. After execution
+    the estimate is recorded next to the bytes actually processed and billed.
+
+    Narrowing pays off because the ETL partitions the fact tables by year
+    (see write_to_table.partition_fact_table), so the second dry run only
+    counts the latest year's partition.
+
+    Args:
+        max_bytes (int): Maximum bytes a single query may scan.
+        max_rows (int): Maximum rows a single query may return.
+        history (int): Number of recent executions kept for the metrics.
+        quarter_check_seconds (float): How long the latest loaded quarter is
+            cached before it is looked up again.
+    """
+
+    def __init__(self, max_bytes: int = 1024 ** 3, max_rows: int = 10000,
+                 history: int = 500, quarter_check_seconds: float = 300):
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.quarter_check_seconds = quarter_check_seconds
+        self._latest_quarter = None
+        self._latest_quarter_checked_at = 0.0
+        self._records = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._rewritten = 0
+        self._rejected = 0
+
+    @staticmethod
+    def dry_run(client, sql: str):
+        """Return the dry-run job for a query without running it."""
+        from google.cloud import bigquery
+
+        job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+        return client.query(sql, job_config=job_config)
+
+    def latest_quarter(self, client):
+        """
+        Return the latest loaded quarter as (year, month), or None if unknown.
+
+        Read from the small summary_institution_counts table and cached for
+        ``quarter_check_seconds``.
+        """
+        with self._lock:
+            if time.time() - self._latest_quarter_checked_at < self.quarter_check_seconds:
+                return self._latest_quarter
+        rows = list(client.query(
+            f"SELECT year, month FROM `{DATASET_ID}.summary_institution_counts` "
+            f"ORDER BY year DESC, month DESC LIMIT 1").result())
+        quarter = (int(rows[0]["year"]), int(rows[0]["month"])) if rows else None
+        with self._lock:
+            self._latest_quarter = quarter
+            self._latest_quarter_checked_at = time.time()
+        return quarter
+
+    def prepare(self, client, sql: str) -> dict:
+        """
+        Check a query against the budget, rewriting it if needed.
+
+        Args:
+            client (bigquery.Client): BigQuery client.
+            sql (str): Query to check.
+
+        Returns:
+            dict: "sql" to run, its "estimated_bytes", whether it was
+            "rewritten" and the (year, month) it was "narrowed_to", if any.
+
+        Raises:
+            QueryRejectedError: If the query is not a SELECT or still exceeds
+                the budget after rewriting.
+        """
+        job = self.dry_run(client, sql)
+        if job.statement_type != "SELECT":
+            with self._lock:
+                self._rejected += 1
+            raise QueryRejectedError(f"Only SELECT queries are allowed, got {job.statement_type}.")
+
+        estimated_bytes = job.total_bytes_processed or 0
+        rewritten = False
+        narrowed_to = None
+        if estimated_bytes > self.max_bytes:
+            quarter = self.latest_quarter(client)
+            rewritten_sql = add_latest_quarter_filters(sql, *quarter) if quarter else sql
+            if rewritten_sql != sql:
+                sql = rewritten_sql
+                estimated_bytes = self.dry_run(client, sql).total_bytes_processed or 0
+                rewritten = True
+                narrowed_to = quarter
+            if estimated_bytes > self.max_bytes:
+                with self._lock:
+                    self._rejected += 1
+                raise QueryRejectedError(
+                    f"Query would scan {estimated_bytes:,} bytes, over the "
+                    f"{self.max_bytes:,} byte budget. Try narrowing it to a quarter.")
+
+        limited_sql = add_row_limit(sql, self.max_rows)
+        rewritten = rewritten or limited_sql != sql.strip().rstrip(";").strip()
+        if rewritten:
+            with self._lock:
+                self._rewritten += 1
+        return {"sql": limited_sql, "estimated_bytes": estimated_bytes,
+                "rewritten": rewritten, "narrowed_to": narrowed_to}
+
+    def record(self, prepared: dict, job) -> dict:
+        """
+        Record a query's estimated cost next to what it actually cost.
+
+        Args:
+            prepared (dict): Result of ``prepare`` for the query.
+            job (bigquery.QueryJob): The finished query job.
+
+        Returns:
+            dict: Estimated, processed and billed bytes and whether the
+            result came from BigQuery's cache.
+        """
+        cost = {"estimated_bytes": prepared["estimated_bytes"],
+                "processed_bytes": job.total_bytes_processed,
+                "billed_bytes": job.total_bytes_billed,
+                "cache_hit": job.cache_hit,
+                "rewritten": prepared["rewritten"],
+                "narrowed_to": prepared["narrowed_to"]}
+        with self._lock:
+            self._records.append(cost)
+        return cost
+
+    def stats(self) -> dict:
+        """Return budget settings, rewrite/reject counters and recent costs."""
+        with self._lock:
+            records = list(self._records)
+            return {
+                "max_bytes": self.max_bytes,
+                "max_rows": self.max_rows,
+                "rewritten": self._rewritten,
+                "rejected": self._rejected,
+                "executed": len(records),
+                "estimated_bytes": sum(r["estimated_bytes"] for r in records),
+                "processed_bytes": sum(r["processed_bytes"] or 0 for r in records),
+                "billed_bytes": sum(r["billed_bytes"] or 0 for r in records),
+                "recent": records[-20:],
+            }
@@ -0,0 +1,216 @@
+import re
+from query_cache import normalize_question
+
+DATASET_ID = "alpha-rank-ai.financial_institutions"
+
+# Lower bounds of the asset tiers in summary_asset_tiers. Must match ASSET_TIERS
+# in scripts/load_data/write_to_table.py.
+ASSET_TIER_BOUNDARIES = [0, 100000000, 500000000, 1000000000, 10000000000]
+
+_AMOUNT = r"\$?\s*(\d+(?:\.\d+)?)\s*(billion|bn|b|million|mm|m|thousand|k)?\b"
+_UNITS = {"billion": 1e9, "bn": 1e9, "b": 1e9, "million": 1e6, "mm": 1e6, "m": 1e6,
+          "thousand": 1e3, "k": 1e3}
+_ABOVE = re.compile(r"(?:over|above|more than|greater than|at least|exceeding|>=?)\s*" + _AMOUNT)
+_BELOW = re.compile(r"(?:under|below|less than|fewer than|<)\s*" + _AMOUNT)
+_BETWEEN = re.compile(r"between\s*" + _AMOUNT + r"\s*and\s*" + _AMOUNT)
+# Any dollar amount, with or without a comparison word
+_ANY_AMOUNT = re.compile(r"\$\s*\d|\b\d+(?:\.\d+)?\s*(?:billion|bn|b|million|mm|m|thousand|k)\b")
+_QUARTER = re.compile(r"\bq([1-4])\s*(20\d{2})\b|\b(20\d{2})\s*q([1-4])\b")
+_QUARTER_MONTH = re.compile(r"\b(march|june|september|december)\s*(20\d{2})\b")
+_YEAR = re.compile(r"\b(20\d{2})\b")
+_STATE_CODE = re.compile(r"\bin ([A-Z]{2})\b")
+_QUARTER_END_MONTHS = {"march": 3, "june": 6, "september": 9, "december": 12}
+# Two-letter codes that can appear in the state column
+STATE_CODES = {
+    "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "DC", "FL", "GA", "HI", "ID",
+    "IL", "IN", "IA", "KS", "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS", "MO",
+    "MT", "NE", "NV", "NH", "NJ", "NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA",
+    "RI", "SC", "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY",
+    "AS", "GU", "MP", "PR", "VI",
+}
+
+# Words a routed question may contain. Anything else (a city, a name, a
+# growth condition, ...) changes the meaning, so the question goes to the LLM.
+_COMMON_WORDS = {
+    "how", "many", "number", "of", "count", "the", "are", "is", "there", "were",
+    "what", "whats", "show", "me", "total", "active", "in", "for", "and", "or",
+    "vs", "versus", "compared", "to", "a", "all", "bank", "banks", "credit",
+    "union", "unions", "cus", "institutions", "institution", "financial",
+    "quarter", "latest", "current", "currently", "last", "q", "do", "we", "have",
+}
+_ASSET_WORDS = {
+    "has", "have", "with", "assets", "asset", "over", "above", "more", "greater",
+    "than", "at", "least", "exceeding", "under", "below", "less", "fewer",
+    "between", "tier", "tiers", "by", "each", "per", "size",
+}
+_STATE_WORDS = {
+    "by", "state", "states", "each", "per", "deposits", "deposit", "assets",
+    "asset", "sum", "breakdown", "with", "has", "have",
+}
+
+
+def _amount(number: str, unit: str) -> int:
+    return int(float(number) * _UNITS.get(unit or "", 1))
+
+
+def _institution_types(question: str) -> list:
+    """Which institution types a question asks about."""
+    banks = re.search(r"\bbanks?\b", question) is not None
+    credit_unions = re.search(r"\bcredit unions?\b|\bcus\b", question) is not None
+    if banks and not credit_unions:
+        return ["bank"]
+    if credit_unions and not banks:
+        return ["credit_union"]
+    return ["bank", "credit_union"]
+
+
+def _period_filter(question: str, table: str) -> str:
+    """
+    Build the year/month predicate for a question.
+
+    Explicit quarters ("Q3 2024", "September 2024") are used as-is, a bare year
+    selects the latest quarter loaded for that year, and otherwise the latest
+    quarter loaded overall is used.
+    """
+    match = _QUARTER.search(question)
+    if match:
+        quarter, year = (match.group(1), match.group(2)) if match.group(1) else (match.group(4), match.group(3))
+        return f"year = {int(year)} AND month = {int(quarter) * 3}"
+    match = _QUARTER_MONTH.search(question)
+    if match:
+        return f"year = {int(match.group(2))} AND month = {_QUARTER_END_MONTHS[match.group(1)]}"
+    latest = f"SELECT MAX(year * 100 + month) FROM `{DATASET_ID}.{table}`"
+    match = _YEAR.search(question)
+    if match:
+        latest += f" WHERE year = {int(match.group(1))}"
+    return f"year * 100 + month = ({latest})"
+
+
+def _types_filter(types: list) -> str:
+    return "institution_type IN (" + ", ".join(f"'{t}'" for t in types) + ")"
+
+
+def _asset_range(question: str):
+    """
+    Parse an asset range from a question.
+
+    Returns:
+        tuple: (min_assets, max_assets) where either may be None, or None if
+        the question has no range or it does not line up with tier boundaries.
+    """
+    match = _BETWEEN.search(question)
+    if match:
+        low, high = _amount(match.group(1), match.group(2)), _amount(match.group(3), match.group(4))
+    else:
+        above, below = _ABOVE.search(question), _BELOW.search(question)
+        if not above and not below:
+            return None
+        low = _amount(above.group(1), above.group(2)) if above else None
+        high = _amount(below.group(1), below.group(2)) if below else None
+    boundaries = ASSET_TIER_BOUNDARIES
+    if (low is not None and low not in boundaries) or (high is not None and high not in boundaries):
+        return None
+    return low, high
+
+
+def _has_amount(question: str) -> bool:
+    """Whether a question mentions a dollar amount or an asset threshold."""
+    return any(pattern.search(question) for pattern in (_BETWEEN, _ABOVE, _BELOW, _ANY_AMOUNT))
+
+
+def _period_count(question: str) -> int:
+    """Number of distinct quarters and years a question mentions."""
+    periods = set()
+    for match in _QUARTER.finditer(question):
+        periods.add(match.group(0))
+        question = question.replace(match.group(0), " ")
+    for match in _QUARTER_MONTH.finditer(question):
+        periods.add(match.group(0))
+        question = question.replace(match.group(0), " ")
+    return len(periods | set(_YEAR.findall(question)))
+
+
+def _only_known_words(question: str, allowed: set) -> bool:
+    """Whether every word left after removing amounts and periods is in ``allowed``."""
+    for pattern in (_BETWEEN, _ABOVE, _BELOW, _QUARTER, _QUARTER_MONTH, _YEAR):
+        question = pattern.sub(" ", question)
+    words = re.findall(r"[a-z]+", question.replace("'", ""))
+    return all(word in allowed for word in words)
+
+
+def route_question(question: str):
+    """
+    Map a common analytical question onto SQL against the summary tables.
+
+    Only questions whose meaning is unambiguous are routed, for example
+    "how many banks have over $1B in assets", "total deposits by state" or
+    "how many banks vs credit unions". Anything else returns None and goes
+    through the LLM.
+
+    Args:
+        question (str): Natural-language question.
+
+    Returns:
+        str: SQL answering the question from the summary tables, or None.
+    """
+    normalized = normalize_question(question)
+    types = _institution_types(normalized)
+
+    # Comparisons across periods ("2023 vs 2024") need more than one filter
+    if _period_count(normalized) > 1:
+        return None
+
+    if "by state" in normalized or _STATE_CODE.search(question):
+        if not re.search(r"\b(deposits|assets|how many|number of|count)\b", normalized):
+            return None
+        # The state totals cannot apply an asset threshold
+        if _has_amount(normalized):
+            return None
+        state = _STATE_CODE.search(question)
+        if state and state.group(1) not in STATE_CODES:
+            return None
+        words = normalized.replace(f"in {state.group(1).lower()}", " ") if state else normalized
+        if not _only_known_words(words, _COMMON_WORDS | _STATE_WORDS):
+            return None
+        state_filter = f" AND state = '{state.group(1)}'" if state else ""
+        return (f"SELECT year, month, institution_type, state, institution_count, "
+                f"total_assets, total_deposits\n"
+                f"FROM `{DATASET_ID}.summary_state_totals`\n"
+                f"WHERE {_types_filter(types)} AND {_period_filter(normalized, 'summary_state_totals')}"
+                f"{state_filter}\n"
+                f"ORDER BY total_deposits DESC")
+
+    if not re.search(r"\b(how many|number of|count)\b", normalized):
+        return None
+
+    if "asset" in normalized:
+        if not _only_known_words(normalized, _COMMON_WORDS | _ASSET_WORDS):
+            return None
+        if "tier" in normalized:
+            if _has_amount(normalized):
+                return None
+            return (f"SELECT year, month, institution_type, asset_tier, institution_count\n"
+                    f"FROM `{DATASET_ID}.summary_asset_tiers`\n"
+                    f"WHERE {_types_filter(types)} AND {_period_filter(normalized, 'summary_asset_tiers')}\n"
+                    f"ORDER BY institution_type, min_assets")
+        asset_range = _asset_range(normalized)
+        if asset_range is None:
+            return None
+        low, high = asset_range
+        range_filter = ""
+        if low is not None:
+            range_filter += f" AND min_assets >= {low}"
+        if high is not None:
+            range_filter += f" AND max_assets <= {high}"
+        return (f"SELECT year, month, institution_type, SUM(institution_count) AS institution_count\n"
+                f"FROM `{DATASET_ID}.summary_asset_tiers`\n"
+                f"WHERE {_types_filter(types)} AND {_period_filter(normalized, 'summary_asset_tiers')}"
+                f"{range_filter}\n"
+                f"GROUP BY year, month, institution_type")
+
+    # Plain counts, e.g. "how many banks vs credit unions are there"
+    if _has_amount(normalized) or not _only_known_words(normalized, _COMMON_WORDS):
+        return None
+    return (f"SELECT year, month, institution_type, institution_count\n"
+            f"FROM `{DATASET_ID}.summary_institution_counts`\n"
+            f"WHERE {_types_filter(types)} AND {_period_filter(normalized, 'summary_institution_counts')}")
@@ -0,0 +1,296 @@
+import bisect
+import csv
+import glob
+import io
+import os
+import re
+from collections import Counter, defaultdict
+
+# Generic words dropped from the end of a name to build a short alias, e.g.
+# "Bank of America, National Association" -> "bank of america".
+_GENERIC_SUFFIXES = [
+    "national association", "federal credit union", "credit union", "fcu",
+    "na", "inc", "the",
+]
+# Longest run of words checked when looking for names inside a question
+_MAX_NAME_WORDS = 8
+# Only the rarest trigrams of a query are used to collect candidates
+_CANDIDATE_TRIGRAMS = 12
+# Words of ordinary questions. A phrase made only of these (e.g. "show me",
+# "members", "the state") is never taken as an institution name, even if some
+# institution is called that.
+_QUESTION_WORDS = {
+    "a", "about", "all", "an", "and", "any", "are", "as", "asset", "assets", "at",
+    "average", "bank", "banks", "biggest", "by", "compare", "compared", "count",
+    "credit", "cu", "cus", "deposit", "deposits", "did", "do", "does", "each",
+    "for", "from", "give", "had", "has", "have", "how", "in", "institution",
+    "institutions", "is", "largest", "last", "latest", "list", "many", "me",
+    "member", "members", "most", "much", "number", "of", "on", "or", "per",
+    "quarter", "show", "smallest", "state", "states", "tell", "than", "that",
+    "the", "their", "there", "this", "to", "top", "total", "union", "unions",
+    "us", "vs", "was", "were", "what", "which", "who", "with", "year",
+}
+# State and territory names are places in a question, not institutions
+_STATE_NAMES = {
+    "alabama", "alaska", "arizona", "arkansas", "california", "colorado",
+    "connecticut", "delaware", "district of columbia", "florida", "georgia",
+    "hawaii", "idaho", "illinois", "indiana", "iowa", "kansas", "kentucky",
+    "louisiana", "maine", "maryland", "massachusetts", "michigan", "minnesota",
+    "mississippi", "missouri", "montana", "nebraska", "nevada", "new hampshire",
+    "new jersey", "new mexico", "new york", "north carolina", "north dakota",
+    "ohio", "oklahoma", "oregon", "pennsylvania", "rhode island",
+    "south carolina", "south dakota", "tennessee", "texas", "utah", "vermont",
+    "virginia", "washington", "west virginia", "wisconsin", "wyoming",
+    "puerto rico", "guam", "american samoa", "virgin islands",
+}
+
+DIM_FILES = {
+    "bank": "formatted_bank_dim_data",
+    "credit_union": "formatted_cu_dim_data",
+}
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize an institution name for matching.
+
+    Lower-cases, spells out "&", drops punctuation and collapses whitespace,
+    e.g. "First Bank & Trust, Inc." -> "first bank and trust inc".
+    """
+    name = name.lower().replace("&", " and ")
+    name = re.sub(r"[^a-z0-9 ]+", " ", name)
+    return re.sub(r"\s+", " ", name).strip()
+
+
+def _alias(normalized: str) -> str:
+    """Strip generic trailing words from a normalized name."""
+    alias = normalized
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in _GENERIC_SUFFIXES:
+            if alias.endswith(" " + suffix):
+                alias = alias[:-len(suffix) - 1]
+                stripped = True
+    # Leading "the" is never meaningful either
+    return alias.removeprefix("the ").strip()
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    In-memory index of bank and credit union names.
+
+    Supports exact lookup of full names and short aliases (used to find
+    institutions mentioned in a question), prefix search, and fuzzy trigram
+    search, each optionally narrowed by state, city or institution type.
+
+    Args:
+        entries (list): Dicts with "charter_id", "name", "institution_type",
+            "state" and "city" keys.
+    """
+
+    def __init__(self, entries: list):
+        self.entries = entries
+        self._exact = defaultdict(list)
+        self._full_names = set()
+        self._trigrams = defaultdict(list)
+        self._entry_trigrams = []
+        self._by_state = defaultdict(set)
+        self._by_city = defaultdict(set)
+        prefixes = []
+
+        for idx, entry in enumerate(entries):
+            normalized = normalize_name(entry["name"])
+            self._full_names.add(normalized)
+            for key in {normalized, _alias(normalized)}:
+                if key:
+                    self._exact[key].append(idx)
+            grams = _trigrams(normalized)
+            self._entry_trigrams.append(grams)
+            for gram in grams:
+                self._trigrams[gram].append(idx)
+            prefixes.append((normalized, idx))
+            self._by_state[(entry["state"] or "").upper()].add(idx)
+            self._by_city[normalize_name(entry["city"] or "")].add(idx)
+
+        prefixes.sort()
+        self._prefix_keys = [key for key, _ in prefixes]
+        self._prefix_ids = [idx for _, idx in prefixes]
+
+    @classmethod
+    def from_csv_files(cls, paths: dict) -> "NameIndex":
+        """
+        Build an index from the formatted dimension CSVs written by the ETL.
+
+        Args:
+            paths (dict): Institution type -> file path or file-like object.
+
+        Returns:
+            NameIndex: Index over every row of every file.
+        """
+        entries = []
+        for institution_type, source in paths.items():
+            f = open(source, newline="") if isinstance(source, str) else source
+            with f:
+                for row in csv.DictReader(f):
+                    if not row.get("name"):
+                        continue
+                    entries.append({
+                        "charter_id": row["charter_id"],
+                        "name": row["name"],
+                        "institution_type": institution_type,
+                        "state": row.get("state") or "",
+                        "city": row.get("city") or "",
+                    })
+        print(f"Built name index over {len(entries)} institutions.")
+        return cls(entries)
+
+    @classmethod
+    def from_latest_files(cls, source: str) -> "NameIndex":
+        """
+        Build an index from the newest formatted dimension files in a location.
+
+        Args:
+            source (str): ``gs://bucket`` or a local directory holding the
+                ``formatted_*_dim_data*.csv`` files.
+
+        Returns:
+            NameIndex: The index.
+        """
+        paths = {}
+        if source.startswith("gs://"):
+            from google.cloud import storage
+
+            bucket = storage.Client().bucket(source[len("gs://"):].rstrip("/"))
+            for institution_type, prefix in DIM_FILES.items():
+                blobs = list(bucket.list_blobs(prefix=prefix))
+                if blobs:
+                    latest = max(blobs, key=lambda blob: blob.updated)
+                    paths[institution_type] = io.StringIO(latest.download_as_text())
+        else:
+            for institution_type, prefix in DIM_FILES.items():
+                files = glob.glob(os.path.join(source, f"{prefix}*.csv"))
+                if files:
+                    paths[institution_type] = max(files, key=os.path.getmtime)
+        return cls.from_csv_files(paths)
+
+    def _facet_filter(self, state=None, city=None, institution_type=None):
+        """Return a predicate on entry ids for the requested facets."""
+        allowed = None
+        if state:
+            allowed = self._by_state.get(state.upper(), set())
+        if city:
+            city_ids = self._by_city.get(normalize_name(city), set())
+            allowed = city_ids if allowed is None else allowed & city_ids
+
+        def keep(idx):
+            if allowed is not None and idx not in allowed:
+                return False
+            return institution_type is None or self.entries[idx]["institution_type"] == institution_type
+        return keep
+
+    def _match(self, idx: int, score: float) -> dict:
+        return dict(self.entries[idx], score=round(score, 3))
+
+    def lookup(self, name: str) -> list:
+        """Return institutions whose full name or alias is exactly ``name``."""
+        normalized = normalize_name(name)
+        ids = self._exact.get(normalized) or self._exact.get(_alias(normalized), [])
+        return [self._match(idx, 1.0) for idx in ids]
+
+    def search(self, query: str, state: str = None, city: str = None,
+               institution_type: str = None, limit: int = 10) -> list:
+        """
+        Find institutions by name, tolerating partial and misspelled names.
+
+        Exact matches rank first, then names starting with the query, then
+        names ranked by trigram similarity to the query.
+
+        Args:
+            query (str): Name or partial name.
+            state (str): Optional two-letter state code to restrict to.
+            city (str): Optional city to restrict to.
+            institution_type (str): Optional "bank" or "credit_union".
+            limit (int): Maximum number of matches.
+
+        Returns:
+            list: Matching entries with a "score" between 0 and 1.
+        """
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+        keep = self._facet_filter(state, city, institution_type)
+        scores = {}
+
+        for idx in self._exact.get(normalized, []) + self._exact.get(_alias(normalized), []):
+            if keep(idx):
+                scores[idx] = 1.0
+
+        start = bisect.bisect_left(self._prefix_keys, normalized)
+        for position in range(start, len(self._prefix_keys)):
+            if not self._prefix_keys[position].startswith(normalized) or len(scores) >= limit * 4:
+                break
+            idx = self._prefix_ids[position]
+            if keep(idx) and idx not in scores:
+                scores[idx] = 0.9 * len(normalized) / len(self._prefix_keys[position]) + 0.05
+
+        query_grams = _trigrams(normalized)
+        rarest = sorted((gram for gram in query_grams if gram in self._trigrams),
+                        key=lambda gram: len(self._trigrams[gram]))[:_CANDIDATE_TRIGRAMS]
+        candidates = Counter(idx for gram in rarest for idx in self._trigrams[gram]
+                             if idx not in scores and keep(idx))
+        for idx, _ in candidates.most_common(limit * 20):
+            grams = self._entry_trigrams[idx]
+            scores[idx] = 0.9 * len(query_grams & grams) / len(query_grams | grams)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [self._match(idx, score) for idx, score in ranked]
+
+    def _is_name_mention(self, phrase: str) -> bool:
+        """Whether a phrase of a question can be read as an institution name."""
+        words = phrase.split()
+        if phrase in _STATE_NAMES or all(word in _QUESTION_WORDS for word in words):
+            return False
+        # A single word must be an institution's full name, not just an alias
+        return len(words) > 1 or (len(phrase) > 3 and phrase in self._full_names)
+
+    def resolve(self, question: str) -> list:
+        """
+        Find institutions mentioned by name in a question.
+
+        Checks every run of up to eight words against the exact-name and
+        alias table, preferring the longest mention. Phrases made only of
+        ordinary question words or naming a state are ignored, and mentions
+        that match more than one institution (e.g. "first national bank")
+        are skipped so they never produce a misleading hint.
+
+        Args:
+            question (str): Natural-language question.
+
+        Returns:
+            list: One dict per mention with the "mention" text and its single
+            "matches" entry.
+        """
+        words = normalize_name(question).split()
+        mentions = []
+        position = 0
+        while position < len(words):
+            for length in range(min(_MAX_NAME_WORDS, len(words) - position), 0, -1):
+                phrase = " ".join(words[position:position + length])
+                ids = self._exact.get(phrase)
+                if not ids or not self._is_name_mention(phrase):
+                    continue
+                institutions = {(self.entries[idx]["institution_type"],
+                                 self.entries[idx]["charter_id"]) for idx in ids}
+                if len(institutions) == 1:
+                    mentions.append({"mention": phrase, "matches": [self._match(ids[0], 1.0)]})
+                position += length
+                break
+            else:
+                position += 1
+        return mentions
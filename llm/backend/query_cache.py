@@ -0,0 +1,205 @@
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question so trivially different phrasings share a cache key.
+
+    Lower-cases the text, collapses whitespace and drops trailing punctuation,
+    e.g. "How many banks have  over $1B in assets?" ->
+    "how many banks have over $1b in assets".
+
+    Args:
+        question (str): Question as typed by the user.
+
+    Returns:
+        str: Normalized question.
+    """
+    question = re.sub(r'\s+', ' ', question.strip().lower())
+    return question.rstrip('?.! ')
+
+
+def _percentile(values, pct: float) -> float:
+    """Return the pct-th percentile of values (nearest-rank), or 0.0 if empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class QueryCache:
+    """
+    Thread-safe LRU + TTL cache of normalized question -> generated SQL -> result.
+
+    Entries are tagged with the data version they were computed against. When
+    the ETL loads a new quarter the version changes and the whole cache is
+    dropped, so answers never mix quarters.
+
+    Args:
+        max_entries (int): Maximum number of cached questions before the least
+            recently used one is evicted.
+        ttl_seconds (float): How long an entry stays valid after it is stored.
+        version_check_seconds (float): Minimum time between data version checks.
+        latency_window (int): Number of recent request latencies kept per
+            hit/miss bucket for the latency metrics.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 86400,
+                 version_check_seconds: float = 300, latency_window: int = 1000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version_check_seconds = version_check_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._last_version_check = 0.0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._latencies = {'hit': deque(maxlen=latency_window),
+                           'miss': deque(maxlen=latency_window)}
+
+    @property
+    def data_version(self):
+        """The data version seen by the last check, or None before the first one."""
+        return self._data_version
+
+    def get(self, question: str):
+        """
+        Look up a question.
+
+        Args:
+            question (str): Question as typed by the user.
+
+        Returns:
+            dict: The cached entry with "sql", "result", "data_version" and
+            "cached_at" keys, or None on a miss or an expired entry.
+        """
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry['cached_at'] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, question: str, sql: str, result) -> None:
+        """
+        Store the generated SQL and result for a question.
+
+        Args:
+            question (str): Question as typed by the user.
+            sql (str): SQL generated for the question.
+            result: Result of running the SQL.
+        """
+        key = normalize_question(question)
+        with self._lock:
+            self._entries[key] = {'sql': sql, 'result': result,
+                                  'data_version': self._data_version,
+                                  'cached_at': time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def discard(self, question: str) -> None:
+        """
+        Drop an entry that turned out to be unusable after ``get`` returned it.
+
+        The lookup that returned it is reclassified from a hit to a miss, so the
+        hit rate only counts answers actually served from the cache.
+
+        Args:
+            question (str): Question as typed by the user.
+        """
+        key = normalize_question(question)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._hits -= 1
+            self._misses += 1
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+            self._invalidations += 1
+
+    def sync_data_version(self, fetch_version) -> bool:
+        """
+        Invalidate the cache if the underlying data has changed.
+
+        ``fetch_version`` is only called once every ``version_check_seconds``
+        so the check stays off the hot path. If it fails, the current version
+        is kept and the check is retried on the next interval.
+
+        Args:
+            fetch_version (callable): Returns a value identifying the currently
+                loaded data, e.g. the last-modified time of the main tables.
+
+        Returns:
+            bool: True if the data version changed and the cache was dropped.
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._last_version_check < self.version_check_seconds:
+                return False
+            self._last_version_check = now
+
+        try:
+            version = fetch_version()
+        except Exception as e:
+            # Keep serving against the version we know rather than failing requests
+            print(f"Data version check failed; keeping version {self._data_version}: {e}")
+            return False
+        with self._lock:
+            changed = self._data_version is not None and version != self._data_version
+            self._data_version = version
+            if changed:
+                self._entries.clear()
+                self._invalidations += 1
+        if changed:
+            print(f"Data version changed to {version}; query cache invalidated.")
+        return changed
+
+    def record_latency(self, hit: bool, seconds: float) -> None:
+        """Record the end-to-end latency of a request served as a hit or a miss."""
+        with self._lock:
+            self._latencies['hit' if hit else 'miss'].append(seconds)
+
+    def stats(self) -> dict:
+        """
+        Return hit-rate and latency metrics.
+
+        Returns:
+            dict: Counters, hit rate and p50/p95 latency (ms) for hits and misses.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            stats = {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'data_version': self._data_version,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+            }
+            for bucket, latencies in self._latencies.items():
+                stats[f'{bucket}_latency_ms'] = {
+                    'count': len(latencies),
+                    'p50': round(_percentile(latencies, 50) * 1000, 2),
+                    'p95': round(_percentile(latencies, 95) * 1000, 2),
+                }
+        return stats
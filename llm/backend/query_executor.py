@@ -0,0 +1,109 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncQueryExecutor:
+    """
+    Run blocking query work off the event loop with bounded concurrency.
+
+    LLM generation and BigQuery execution are blocking calls, so each one runs
+    on a dedicated thread pool sized to ``max_concurrency``. Identical requests
+    that arrive while one is already running share its result instead of
+    starting a second LLM round trip. When every caller waiting on a request
+    has timed out, the request is cancelled so abandoned work does not hold a
+    slot; work already running on a thread cannot be interrupted and finishes,
+    but new callers start afresh instead of joining it.
+
+    Args:
+        max_concurrency (int): Maximum number of queries running at once.
+            Further requests wait for a free slot.
+        timeout_seconds (float): How long a single request waits (including
+            time spent waiting for a slot) before giving up.
+    """
+
+    def __init__(self, max_concurrency: int = 8, timeout_seconds: float = 120):
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency,
+                                        thread_name_prefix='query')
+        self._semaphore = None
+        self._inflight = {}
+        self._waiters = {}
+        self._started = 0
+        self._deduplicated = 0
+        self._timeouts = 0
+        self._cancelled = 0
+
+    async def run(self, key: str, func, *args):
+        """
+        Run ``func(*args)`` on the pool, sharing the result with identical requests.
+
+        Args:
+            key (str): Identifies the request; concurrent calls with the same
+                key are deduplicated.
+            func (callable): Blocking function to run.
+            *args: Arguments passed to ``func``.
+
+        Returns:
+            The return value of ``func``.
+
+        Raises:
+            asyncio.TimeoutError: If the result is not ready within
+                ``timeout_seconds``.
+        """
+        if self._semaphore is None:
+            # Created lazily so it binds to the running event loop.
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run_bounded(func, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self._started += 1
+        else:
+            self._deduplicated += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+
+        try:
+            # Shield the shared task so one caller timing out does not cancel
+            # it for the other callers waiting on the same key.
+            return await asyncio.wait_for(asyncio.shield(task), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # Nobody is waiting for the result any more
+                    task.cancel()
+                    self._forget(key, task)
+                    self._cancelled += 1
+
+    def _forget(self, key: str, task) -> None:
+        """Remove ``task`` from the in-flight requests, unless a newer one took its key."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def _run_bounded(self, func, *args):
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, func, *args)
+
+    def stats(self) -> dict:
+        """Return concurrency, deduplication and timeout counters."""
+        return {
+            'max_concurrency': self.max_concurrency,
+            'timeout_seconds': self.timeout_seconds,
+            'in_flight': len(self._inflight),
+            'started': self._started,
+            'deduplicated': self._deduplicated,
+            'timeouts': self._timeouts,
+            'cancelled': self._cancelled,
+        }
+
+    def shutdown(self) -> None:
+        """Stop accepting work and release the thread pool."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
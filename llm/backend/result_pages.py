@@ -0,0 +1,96 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+
+# BigQuery keeps anonymous query result tables for about 24 hours, so cursors
+# (and cached answers that point at them) must not outlive that.
+RESULT_RETENTION_SECONDS = 23 * 3600
+
+# Cursors are signed so clients can only page through results this backend
+# returned. Set CURSOR_SECRET to the same value on every instance; without it
+# each process signs with its own random key and cursors only work on the
+# instance that issued them. That is fine for a single local process, so the
+# secret is only required on Cloud Run (which sets K_SERVICE).
+_CURSOR_SECRET = os.getenv("CURSOR_SECRET")
+if not _CURSOR_SECRET:
+    if os.getenv("K_SERVICE"):
+        raise RuntimeError("CURSOR_SECRET must be set so every instance can verify "
+                           "the result cursors the others issue.")
+    print("Warning: CURSOR_SECRET is not set; result cursors will only work on "
+          "this process. Set it to the same value on every backend instance.")
+_CURSOR_KEY = (_CURSOR_SECRET or secrets.token_hex(32)).encode()
+
+
+def _sign(payload: bytes) -> str:
+    digest = hmac.new(_CURSOR_KEY, payload, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def encode_cursor(job_id: str, location: str, offset: int) -> str:
+    """Encode a position in a query job's results as an opaque, signed, URL-safe cursor."""
+    payload = json.dumps({"job": job_id, "loc": location, "offset": offset}).encode()
+    return f"{base64.urlsafe_b64encode(payload).decode()}.{_sign(payload)}"
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Decode a cursor produced by encode_cursor and check its signature.
+
+    Returns:
+        tuple: (job_id, location, offset)
+
+    Raises:
+        ValueError: If the cursor is malformed or was not signed by this backend.
+    """
+    try:
+        encoded, signature = cursor.split(".")
+        payload = base64.urlsafe_b64decode(encoded.encode())
+        if not hmac.compare_digest(signature, _sign(payload)):
+            raise ValueError("bad signature")
+        payload = json.loads(payload)
+        return payload["job"], payload["loc"], int(payload["offset"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def fetch_page(job, offset: int, page_size: int) -> dict:
+    """
+    Read one page of a finished query job's results in columnar form.
+
+    Pages are read from the job's result table, so any backend instance can
+    serve any page without re-running the query.
+
+    Args:
+        job (bigquery.QueryJob): Finished query job.
+        offset (int): Index of the first row to return.
+        page_size (int): Maximum number of rows to return.
+
+    Returns:
+        dict: Column names and BigQuery types, a column -> values mapping,
+        the page's offset and row count, the total row count and a cursor
+        for the next page (None on the last page).
+    """
+    rows = job.result(start_index=offset, max_results=page_size)
+    columns = [{"name": field.name, "type": field.field_type} for field in rows.schema]
+    data = {column["name"]: [] for column in columns}
+    row_count = 0
+    for row in rows:
+        for column, value in zip(columns, row.values()):
+            data[column["name"]].append(value)
+        row_count += 1
+
+    total_rows = rows.total_rows or 0
+    next_offset = offset + row_count
+    return {
+        "result_id": job.job_id,
+        "columns": columns,
+        "data": data,
+        "offset": offset,
+        "row_count": row_count,
+        "total_rows": total_rows,
+        "next_cursor": (encode_cursor(job.job_id, job.location, next_offset)
+                        if row_count and next_offset < total_rows else None),
+    }
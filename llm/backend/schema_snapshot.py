@@ -0,0 +1,63 @@
+import json
+import time
+
+
+def load_schema_snapshot(uri: str):
+    """
+    Load the schema snapshot published by the ETL.
+
+    Args:
+        uri (str): ``gs://bucket/path.json`` or a local file path.
+
+    Returns:
+        dict: The snapshot, with a "loaded_at" timestamp added, or None if it
+        could not be loaded.
+    """
+    try:
+        if uri.startswith('gs://'):
+            from google.cloud import storage
+
+            bucket_name, blob_name = uri[len('gs://'):].split('/', 1)
+            content = storage.Client().bucket(bucket_name).blob(blob_name).download_as_text()
+        else:
+            with open(uri) as f:
+                content = f.read()
+        snapshot = json.loads(content)
+    except Exception as e:
+        print(f"Warning: could not load schema snapshot from {uri}: {e}")
+        return None
+
+    snapshot['loaded_at'] = time.time()
+    print(f"Loaded schema snapshot {snapshot['version']} (data version {snapshot['data_version']}).")
+    return snapshot
+
+
+def render_table_info(snapshot: dict) -> dict:
+    """
+    Render each table in a snapshot as the text SQLDatabase puts in the prompt.
+
+    The output mirrors SQLDatabase's own "CREATE TABLE ... + sample rows"
+    layout, but with one-line column descriptions instead of full DDL.
+
+    Args:
+        snapshot (dict): Snapshot returned by load_schema_snapshot.
+
+    Returns:
+        dict: Table name -> table info text, suitable for SQLDatabase's
+        ``custom_table_info``.
+    """
+    table_info = {}
+    for table_name, table in snapshot['tables'].items():
+        columns = '\n'.join(f"\t{column['name']} {column['type']}"
+                             + (',' if i < len(table['columns']) - 1 else '')
+                             + (f" -- {column['description']}" if column['description'] else '')
+                             for i, column in enumerate(table['columns']))
+        header = '\t'.join(column['name'] for column in table['columns'])
+        rows = '\n'.join('\t'.join(row) for row in table['sample_rows'])
+        table_info[table_name] = (
+            f"-- {table['description']} (~{table['num_rows']} rows)\n"
+            f"CREATE TABLE `{table_name}` (\n{columns}\n)\n\n"
+            f"/*\n{len(table['sample_rows'])} rows from {table_name} table:\n"
+            f"{header}\n{rows}\n*/"
+        )
+    return table_info
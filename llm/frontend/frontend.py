@@ -1,8 +1,52 @@
+import os
+import pandas as pd
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 
 # FastAPI backend URL
-API_URL = "https://backend-service-rq45z6fh3q-uc.a.run.app/query/"
+API_BASE_URL = os.getenv("API_BASE_URL", "https://backend-service-rq45z6fh3q-uc.a.run.app")
+PAGE_SIZE = 500
+REQUEST_TIMEOUT_SECONDS = 180
+# Answers and pages are cached by this Streamlit server for this long, shared by
+# every user (the data is the same for everyone)
+CACHE_TTL_SECONDS = 600
+
+
+@st.cache_resource
+def get_session():
+    """Return a keep-alive HTTP session shared by every rerun of the app."""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return session
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def ask_question(question):
+    """Ask the backend a question; returns the SQL and the first page of results."""
+    response = get_session().post(f"{API_BASE_URL}/query/",
+                                  json={"question": question, "page_size": PAGE_SIZE},
+                                  timeout=REQUEST_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return response.json()
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def fetch_page(cursor):
+    """Fetch the page of results a cursor points to."""
+    response = get_session().get(f"{API_BASE_URL}/results",
+                                 params={"cursor": cursor, "page_size": PAGE_SIZE},
+                                 timeout=REQUEST_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return response.json()
+
+
+def page_to_dataframe(page):
+    """Build a DataFrame from a columnar page of results."""
+    columns = [column["name"] for column in page["columns"]]
+    return pd.DataFrame(page["data"], columns=columns)
+
 
 # Streamlit UI
 st.set_page_config(page_title="Bank Data Query Assistant", layout="wide")
@@ -13,21 +57,42 @@ st.title("🔍 Bank & Credit Union Data Query")
 user_input = st.text_input("Ask a question about bank data:", "")
 
 if user_input:
-    with st.spinner("Processing..."):
-        response = requests.post(API_URL, json={"question": user_input})
-
-        if response.status_code == 200:
-            data = response.json()
-            sql_query = data["query"]
-            results = data["results"]
-
-            st.subheader("Generated SQL Query")
-            st.code(sql_query, language="sql")
-
-            st.subheader("Query Results")
-            if results:
-                st.write(results)
-            else:
-                st.warning("No results found.")
-        else:
-            st.error("Error querying the database. Please try again.")
+    try:
+        with st.spinner("Processing..."):
+            data = ask_question(user_input)
+    except requests.RequestException as e:
+        # Show the backend's reason (e.g. the cost guard rejecting a query)
+        detail = None
+        if e.response is not None and e.response.headers.get("content-type") == "application/json":
+            detail = e.response.json().get("detail")
+        st.error(detail or "Error querying the database. Please try again.")
+        st.stop()
+
+    st.subheader("Generated SQL Query")
+    st.code(data["sql"], language="sql")
+
+    st.subheader("Query Results")
+    if data.get("notice"):
+        st.info(data["notice"])
+    page = data["results"]
+    if not page["total_rows"]:
+        st.warning("No results found.")
+        st.stop()
+
+    # Render the first page right away, then append pages as they arrive.
+    # st.dataframe only draws the visible rows, so large results stay responsive.
+    table = st.empty()
+    progress = st.empty()
+    frames = [page_to_dataframe(page)]
+    while True:
+        results = pd.concat(frames, ignore_index=True)
+        table.dataframe(results, use_container_width=True)
+        progress.caption(f"Loaded {len(results):,} of {page['total_rows']:,} rows")
+        if not page["next_cursor"]:
+            break
+        try:
+            page = fetch_page(page["next_cursor"])
+        except requests.RequestException:
+            st.error("Error loading the remaining results. Please try again.")
+            break
+        frames.append(page_to_dataframe(page))
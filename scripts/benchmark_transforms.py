@@ -0,0 +1,247 @@
+"""
+Benchmark the transform steps on synthetic scale-ups of the checked-in data.
+
+Inputs are generated at multiples of bank_dim_data.csv, cu_dim_data.csv and
+cu_fact_data.csv. The repo has no raw bank fact file, so a multi-quarter one
+is synthesized from the bank ids, and prepare_data gets an NCUA-style xlsx
+built from the credit union csvs. Each benchmark runs in a fresh interpreter
+so its peak RSS is not inflated by earlier runs, and memory is budgeted as the
+growth in peak RSS during the call, since the interpreter and pandas alone
+take about 160MB. A benchmark fails when its time or memory growth exceeds its
+budget in benchmark_budgets.json, or when it has no budget there yet (record
+one with --update).
+
+Usage:
+    python scripts/benchmark_transforms.py                      # 1x, 10x, 100x
+    python scripts/benchmark_transforms.py --scales 1,10,100,1000
+    python scripts/benchmark_transforms.py --update             # re-baseline budgets
+"""
+
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from instrumentation import collected_stages, peak_rss_mb, track_stage
+from synthetic_data import XLSX_MAX_ROWS, write_bank_fact, write_copies, write_ncua_xlsx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_ROOT, 'scripts')
+BUDGETS_PATH = os.path.join(SCRIPTS_DIR, 'benchmark_budgets.json')
+
+# Headroom applied to measured time and memory when re-baselining budgets.
+# The absolute slack keeps short runs, where timing is mostly noise, from
+# failing at random.
+TIME_HEADROOM = 1.5
+TIME_SLACK_SECONDS = 0.5
+MEMORY_HEADROOM = 1.2
+MEMORY_SLACK_MB = 25
+
+DEFAULT_SCALES = '1,10,100'
+# Scales from this size up are run once regardless of --repeat
+SINGLE_RUN_SCALE = 100
+
+# benchmark name -> (module, input produced by generate_inputs)
+BENCHMARKS = {
+    'format_bank_dim_data': ('transform_data.transform_bank_data', 'bank_dim'),
+    'format_bank_fact_data': ('transform_data.transform_bank_data', 'bank_fact'),
+    'transform_dim_data': ('transform_data.transform_cu_data', 'cu_dim'),
+    'transform_fact_data': ('transform_data.transform_cu_data', 'cu_fact'),
+    'prepare_data': ('fetch_data.get_credit_union_data', 'cu_xlsx'),
+}
+
+
+def generate_inputs(scale: int, data_dir: str) -> dict:
+    """
+    Generate (or reuse) the synthetic input files for one scale.
+
+    Args:
+        scale (int): Multiple of the checked-in data to generate.
+        data_dir (str): Directory the files are written to.
+
+    Returns:
+        dict: Input name -> file path, or None when the input cannot be built
+        at this scale (the xlsx past Excel's row limit).
+    """
+    import pandas as pd
+
+    bank_dim = pd.read_csv(os.path.join(REPO_ROOT, 'bank_dim_data.csv'), index_col=0)
+    cu_dim = pd.read_csv(os.path.join(REPO_ROOT, 'cu_dim_data.csv'))
+    cu_fact = pd.read_csv(os.path.join(REPO_ROOT, 'cu_fact_data.csv'))
+
+    writers = {
+        'bank_dim': lambda path: write_copies(bank_dim, path, scale, 'ID', index=True),
+        'bank_fact': lambda path: write_bank_fact(bank_dim['ID'], path, scale),
+        'cu_dim': lambda path: write_copies(cu_dim, path, scale, 'CUNumber', index=False),
+        'cu_fact': lambda path: write_copies(cu_fact, path, scale, 'charter_id', index=False),
+        'cu_xlsx': lambda path: write_ncua_xlsx(cu_dim, cu_fact, path, scale),
+    }
+    inputs = {}
+    for name, write in writers.items():
+        if name == 'cu_xlsx' and len(cu_dim) * scale > XLSX_MAX_ROWS:
+            inputs[name] = None
+            continue
+        extension = 'xlsx' if name == 'cu_xlsx' else 'csv'
+        path = os.path.join(data_dir, f'{name}_{scale}x.{extension}')
+        if not os.path.exists(path):
+            print(f"Generating {os.path.basename(path)}")
+            write(path)
+        inputs[name] = path
+    return inputs
+
+
+def run_one(name: str, input_path: str) -> dict:
+    """
+    Run one benchmark in this process and measure it.
+
+    Args:
+        name (str): Key of BENCHMARKS.
+        input_path (str): Input file for the function.
+
+    Returns:
+        dict: "seconds", "rows", "peak_rss_mb" and "rss_growth_mb" (peak RSS
+        during the call minus peak RSS before it) of the call.
+    """
+    module, _ = BENCHMARKS[name]
+    func = getattr(importlib.import_module(module), name)
+    output_path = f'{input_path}.{name}.out.csv'
+    rss_before = peak_rss_mb() or 0
+    try:
+        with track_stage(f'benchmark.{name}') as stage:
+            if name == 'prepare_data':
+                func(input_path)
+            else:
+                func(input_path, output_path)
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+    # Rows are recorded on the function's own stage, nested inside this one
+    return {'seconds': stage['wall_seconds'],
+            'rows': max(s['rows'] for s in collected_stages()),
+            'peak_rss_mb': stage['peak_rss_mb'],
+            'rss_growth_mb': round((stage['peak_rss_mb'] or 0) - rss_before, 1)}
+
+
+def measure(name: str, input_path: str, repeat: int) -> dict:
+    """
+    Run a benchmark ``repeat`` times, each in a fresh interpreter.
+
+    Returns:
+        dict: Best time and highest peak RSS and RSS growth across the runs.
+
+    Raises:
+        RuntimeError: If a run fails.
+    """
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, os.path.abspath(__file__),
+                                 '--run-one', name, input_path],
+                                cwd=SCRIPTS_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{name} failed: {result.stderr.strip().splitlines()[-1:]}")
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return {'seconds': min(run['seconds'] for run in runs),
+            'rows': runs[0]['rows'],
+            'peak_rss_mb': max(run['peak_rss_mb'] or 0 for run in runs),
+            'rss_growth_mb': max(run['rss_growth_mb'] for run in runs)}
+
+
+def load_budgets() -> dict:
+    """Load the per-benchmark budgets, or an empty dict if none exist."""
+    if not os.path.exists(BUDGETS_PATH):
+        return {}
+    with open(BUDGETS_PATH) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', default=DEFAULT_SCALES,
+                        help=f'comma-separated multiples of the checked-in data (default {DEFAULT_SCALES})')
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS),
+                        help='run only this benchmark (repeatable)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help=f'runs per benchmark below {SINGLE_RUN_SCALE}x; the best time is kept')
+    parser.add_argument('--data-dir',
+                        help='keep generated inputs here and reuse them across runs')
+    parser.add_argument('--update', action='store_true',
+                        help='write measured results (plus headroom) as the new budgets')
+    parser.add_argument('--run-one', nargs=2, metavar=('NAME', 'INPUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(*args.run_one)))
+        return
+
+    budgets = load_budgets()
+    measured = {}
+    failures = []
+    temp_dir = None
+    data_dir = args.data_dir
+    if data_dir is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        data_dir = temp_dir.name
+    os.makedirs(data_dir, exist_ok=True)
+
+    try:
+        for scale in (int(s) for s in args.scales.split(',')):
+            inputs = generate_inputs(scale, data_dir)
+            repeat = args.repeat if scale < SINGLE_RUN_SCALE else 1
+            for name in args.only or BENCHMARKS:
+                key = f'{name}@{scale}x'
+                input_path = inputs[BENCHMARKS[name][1]]
+                if input_path is None:
+                    print(f"SKIP  {key}: input cannot be built at this scale")
+                    continue
+                try:
+                    result = measure(name, input_path, repeat)
+                except RuntimeError as e:
+                    print(f"FAIL  {key}: {e}")
+                    failures.append(str(e))
+                    continue
+                measured[key] = result
+
+                budget = budgets.get(key)
+                status = 'OK'
+                if budget is None and not args.update:
+                    # An unbudgeted benchmark could never regress, so treat it as a failure
+                    status = 'FAIL'
+                    failures.append(f"{key} has no budget; run with --update to record one")
+                elif budget is not None and not args.update:
+                    if result['seconds'] > budget['seconds']:
+                        status = 'FAIL'
+                        failures.append(f"{key} took {result['seconds']:.2f}s (budget {budget['seconds']:.2f}s)")
+                    if result['rss_growth_mb'] > budget['rss_growth_mb']:
+                        status = 'FAIL'
+                        failures.append(f"{key} grew RSS by {result['rss_growth_mb']:.0f}MB "
+                                        f"(budget {budget['rss_growth_mb']:.0f}MB)")
+                budget_str = (f"{budget['seconds']:.2f}s, +{budget['rss_growth_mb']:.0f}MB"
+                              if budget is not None else 'n/a')
+                rate = result['rows'] / result['seconds'] if result['seconds'] else 0
+                print(f"{status:5} {key}: {result['seconds']:.2f}s, +{result['rss_growth_mb']:.0f}MB "
+                      f"(peak {result['peak_rss_mb']:.0f}MB), {rate:,.0f} rows/s (budget {budget_str})")
+    finally:
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+    if args.update:
+        budgets.update({key: {'seconds': round(max(result['seconds'] * TIME_HEADROOM,
+                                                   result['seconds'] + TIME_SLACK_SECONDS), 3),
+                              'rss_growth_mb': round(max(result['rss_growth_mb'] * MEMORY_HEADROOM,
+                                                         result['rss_growth_mb'] + MEMORY_SLACK_MB))}
+                        for key, result in measured.items()})
+        with open(BUDGETS_PATH, 'w') as f:
+            json.dump(budgets, f, indent=2, sort_keys=True)
+        print(f"Updated budgets in {BUDGETS_PATH}")
+
+    if failures:
+        print("\nTransform benchmark regressions:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
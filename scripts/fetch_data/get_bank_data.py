@@ -1,7 +1,60 @@
+import functools
+import os
 import requests
 import math
 import pandas as pd
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from instrumentation import (ProgressLogger, instrumented, pipeline_run,
+                             record_bytes, record_file, record_rows)
+
+# Point FDIC_API_BASE_URL at another server, e.g. the local stand-in in
+# scripts/source_stub_server.py, to fetch without hitting the real API.
+FDIC_API_BASE_URL = os.getenv('FDIC_API_BASE_URL', 'https://banks.data.fdic.gov/api').rstrip('/')
+INSTITUTIONS_URL = f"{FDIC_API_BASE_URL}/institutions"
+FINANCIALS_URL = f"{FDIC_API_BASE_URL}/financials"
+PAGE_SIZE = 10000  # API limit is 10k records per request
+# Retries of throttled (429) and failed (5xx) requests; Retry-After is honored
+FDIC_MAX_RETRIES = int(os.getenv('FDIC_MAX_RETRIES', '3'))
+# Keep-alive connections kept open to the API, i.e. the useful fetch concurrency
+FDIC_MAX_CONNECTIONS = int(os.getenv('FDIC_MAX_CONNECTIONS', '16'))
+REQUEST_TIMEOUT_SECONDS = 60
+
+# Dataset name -> (endpoint, fields requested from it)
+DATASETS = {
+    'institutions': (INSTITUTIONS_URL, ('WEBADDR', 'NAME', 'CITY', 'STNAME')),
+    'financials': (FINANCIALS_URL, ('DEP', 'ASSET', 'REPDTE')),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_session() -> requests.Session:
+    """Return a keep-alive session that retries throttled and failed FDIC requests."""
+    retry = Retry(total=FDIC_MAX_RETRIES, backoff_factor=0.5,
+                  status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=('GET',), respect_retry_after_header=True)
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(pool_maxsize=FDIC_MAX_CONNECTIONS, max_retries=retry))
+    session.mount('https://', HTTPAdapter(pool_maxsize=FDIC_MAX_CONNECTIONS, max_retries=retry))
+    return session
+
+
+@instrumented('fetch.fdic_record_count')
+def get_number_of_records(url: str) -> int:
+    """Gets the number of records available from an FDIC API endpoint
+
+    Args:
+        url (str): endpoint URL, e.g. INSTITUTIONS_URL
+
+    Returns:
+        int: number of records
+    """
+    try:
+        response = get_session().get(url, params={'limit': 1}, timeout=REQUEST_TIMEOUT_SECONDS)
+        return response.json()['meta']['total']
+    except Exception as e:
+        raise RuntimeError(f"Failed to retrieve the total number of records from {url}: {e}") from e
 
 
 def get_number_of_institutions():
@@ -10,14 +63,10 @@ def get_number_of_institutions():
     Returns:
         int: number of institutions
     """
-    try:
-        url = "https://banks.data.fdic.gov/api/institutions"
-        response = requests.get(url)
-        return response.json()['meta']['total']
-    except Exception as e:
-        raise RuntimeError(f"Failed to retrieve the total number of institutions: {e}") from e
+    return get_number_of_records(INSTITUTIONS_URL)
 
 
+@instrumented('fetch.fdic_page')
 def get_institution_data_json(url: str, limit: int, offset: int, *fields: str) -> dict:
     """
     Retrieve institution data from the API with a given limit and offset, including specified fields.
@@ -46,7 +95,7 @@ def get_institution_data_json(url: str, limit: int, offset: int, *fields: str) -
 
     try:
         # Create response
-        response = requests.get(url, params=params)
+        response = get_session().get(url, params=params, timeout=REQUEST_TIMEOUT_SECONDS)
 
         # Raise an exception if the HTTP request returned an unsuccessful status code.
         response.raise_for_status()
@@ -54,14 +103,18 @@ def get_institution_data_json(url: str, limit: int, offset: int, *fields: str) -
         # Provide a clear error message including the URL and parameters used.
         raise RuntimeError(f"Error fetching data from {url} with params {params}: {e}") from e
 
+    record_bytes(len(response.content))
     try:
         # Return the response parsed as JSON.
-        return response.json()
+        data = response.json()
+        record_rows(len(data.get('data', [])))
+        return data
     except ValueError as e:
         # Raise an error if JSON decoding fails.
         raise RuntimeError("Error decoding JSON response") from e
 
 
+@instrumented('fetch.bank_dim')
 def get_bank_dim_data(number_of_institutions: int) -> list:
     """
     Retrieve all bank dimension data from the FDIC API in chunks.
@@ -80,12 +133,13 @@ def get_bank_dim_data(number_of_institutions: int) -> list:
     Raises:
         RuntimeError: If any data chunk retrieval encounters an error.
     """
-    base_url = "https://banks.data.fdic.gov/api/institutions"
+    base_url = INSTITUTIONS_URL
 
     # Step 1: Determine the number of iterations required
     iterations = math.ceil(number_of_institutions / 10000)
 
     all_data = []
+    progress = ProgressLogger('fetch.bank_dim', total=number_of_institutions)
 
     # Step 2: Iterate over each page and fetch data.
     for i in range(1, iterations + 1):
@@ -97,18 +151,19 @@ def get_bank_dim_data(number_of_institutions: int) -> list:
             data_chunk = get_institution_data_json(base_url, 10000, offset,
                                                    'WEBADDR', 'NAME', 'CITY',
                                                    'STNAME')
-            print(f"Fetched chunk {i} (records {offset} to {offset + 10000})")
-            for data in data_chunk.get('data', []):
-                print(data)
-                all_data.append(data['data'])
+            records = [data['data'] for data in data_chunk.get('data', [])]
+            all_data.extend(records)
+            progress.update(len(records), chunk=i, offset=offset)
             i += 1
         except Exception as e:
             print(f"Warning: Failed to fetch data chunk {i} (offset {offset}): {e}")
-            return all_data
+            break
     # Step 3: Return the list of all data chunks.
+    record_rows(len(all_data))
     return all_data
 
 
+@instrumented('fetch.bank_fact')
 def get_bank_fact_data(number_of_institutions: int) -> list:
     """
     Retrieve all bank dimension data from the FDIC API in chunks.
@@ -127,9 +182,10 @@ def get_bank_fact_data(number_of_institutions: int) -> list:
     Raises:
         RuntimeError: If any data chunk retrieval encounters an error.
     """
-    base_url = "https://banks.data.fdic.gov/api/financials"
+    base_url = FINANCIALS_URL
 
     all_data = []
+    progress = ProgressLogger('fetch.bank_fact')
     i = 1 # Used to calclate offset to paginate thru data
     while True:
         # Calculate the offset for the current chunk. This allows you to paginate through the data
@@ -139,28 +195,95 @@ def get_bank_fact_data(number_of_institutions: int) -> list:
         try:
             data_chunk = get_institution_data_json(base_url, 10000, offset,
                                                    'DEP', 'ASSET', 'REPDTE')
-            print(f"Fetched chunk {i} (records {offset} to {offset + 10000})")
-            for data in data_chunk.get('data', []):
-                all_data.append(data['data'])
+            records = [data['data'] for data in data_chunk.get('data', [])]
+            # An empty page means we have paged past the last record
+            if not records:
+                break
+            all_data.extend(records)
+            progress.update(len(records), chunk=i, offset=offset)
             i += 1
         except Exception as e:
             print(f"Warning: Failed to fetch data chunk {i} (offset {offset}): {e}")
-            return all_data
+            break
 
+    record_rows(len(all_data))
     return all_data
 
 
+def get_page_offsets(dataset: str) -> list:
+    """
+    List the offsets of every page of a dataset so pages can be fetched in parallel.
+
+    Args:
+        dataset (str): 'institutions' or 'financials'.
+
+    Returns:
+        list: Offsets, one per page of PAGE_SIZE records.
+    """
+    url, _ = DATASETS[dataset]
+    total = get_number_of_records(url)
+    return [page * PAGE_SIZE for page in range(math.ceil(total / PAGE_SIZE))]
+
+
+@instrumented('fetch.bank_page')
+def fetch_bank_page(dataset: str, offset: int, output_dir: str) -> str:
+    """
+    Fetch one page of a dataset from the FDIC API and save it as a csv.
+
+    Unlike get_bank_dim_data and get_bank_fact_data, errors are raised rather
+    than swallowed so the caller (e.g. an Airflow task) can retry the page.
+
+    Args:
+        dataset (str): 'institutions' or 'financials'.
+        offset (int): Offset of the first record of the page.
+        output_dir (str): Directory to write the page to.
+
+    Returns:
+        str: Path of the written page.
+    """
+    url, fields = DATASETS[dataset]
+    data_chunk = get_institution_data_json(url, PAGE_SIZE, offset, *fields)
+    records = [data['data'] for data in data_chunk.get('data', [])]
+
+    output_path = os.path.join(output_dir, f'bank_{dataset}_page_{offset:08d}.csv')
+    pd.DataFrame(records).to_csv(output_path, index=False)
+    record_rows(len(records))
+    record_file(output_path)
+    return output_path
+
+
+@instrumented('fetch.combine_bank_pages')
+def combine_bank_pages(page_paths: list, output_path: str) -> str:
+    """
+    Combine page files into the single csv the transform step expects.
+
+    Args:
+        page_paths (list): Paths returned by fetch_bank_page.
+        output_path (str): Path of the combined csv.
+
+    Returns:
+        str: output_path
+    """
+    frames = [pd.read_csv(path) for path in sorted(page_paths)]
+    combined = pd.concat(frames, ignore_index=True)
+    combined.to_csv(output_path)
+    record_rows(len(combined))
+    record_file(output_path)
+    return output_path
+
+
 def main():
-    CURRENT_TIMESTAMP = datetime.now().timestamp() # Get timestamp to append to file
-    number_of_institutions = get_number_of_institutions() # Used to determine number of iterations
+    with pipeline_run('get_bank_data'):
+        CURRENT_TIMESTAMP = datetime.now().timestamp() # Get timestamp to append to file
+        number_of_institutions = get_number_of_institutions() # Used to determine number of iterations
 
-    bank_dim_data = get_bank_dim_data(number_of_institutions) # Get bank dim data
-    bank_dim_df = pd.DataFrame(bank_dim_data)
-    bank_dim_df.to_csv(f'bank_dim_data_{CURRENT_TIMESTAMP}.csv') # Save data
+        bank_dim_data = get_bank_dim_data(number_of_institutions) # Get bank dim data
+        bank_dim_df = pd.DataFrame(bank_dim_data)
+        bank_dim_df.to_csv(f'bank_dim_data_{CURRENT_TIMESTAMP}.csv') # Save data
 
-    bank_fact_data = get_bank_fact_data(number_of_institutions) # Get bank fact data
-    bank_fact_df = pd.DataFrame(bank_fact_data)
-    bank_fact_df.to_csv(f'bank_fact_data_{CURRENT_TIMESTAMP}.csv') # Save data
+        bank_fact_data = get_bank_fact_data(number_of_institutions) # Get bank fact data
+        bank_fact_df = pd.DataFrame(bank_fact_data)
+        bank_fact_df.to_csv(f'bank_fact_data_{CURRENT_TIMESTAMP}.csv') # Save data
 
 
 if __name__ == '__main__':
@@ -7,15 +7,47 @@ After clicking the download button, the script waits until the download is compl
 import os
 import time
 import pandas as pd
+import requests
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from datetime import datetime
 from helper_functions import get_latest_file
-
-
-def get_credit_union_data(month='09', year='2024'):
+from instrumentation import instrumented, pipeline_run, record_file, record_rows
+
+# Set NCUA_DOWNLOAD_URL to download the workbook directly instead of driving a
+# browser, e.g. from the local stand-in in scripts/source_stub_server.py. It may
+# contain {month} and {year} placeholders.
+NCUA_DOWNLOAD_URL = os.getenv('NCUA_DOWNLOAD_URL')
+REQUEST_TIMEOUT_SECONDS = 300
+
+
+def download_credit_union_file(url: str, download_dir: str, file_name: str) -> str:
+    """
+    Download a credit union workbook from a direct URL.
+
+    Args:
+        url (str): URL of the xlsx file.
+        download_dir (str): Directory to save the file to.
+        file_name (str): Name of the saved file.
+
+    Returns:
+        str: Path of the downloaded file.
+    """
+    path = os.path.join(download_dir, file_name)
+    with requests.get(url, stream=True, timeout=REQUEST_TIMEOUT_SECONDS) as response:
+        response.raise_for_status()
+        with open(path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                f.write(chunk)
+    record_file(path)
+    print(f"Downloaded {url} to {path}")
+    return path
+
+
+@instrumented('fetch.credit_union_download')
+def get_credit_union_data(month='09', year='2024', download_dir='downloads'):
     # URL of the target page; update as needed
     url = (
         "https://webapps.ncua.gov/CustomQuery/Home/SelectAccount?"
@@ -28,10 +60,15 @@ def get_credit_union_data(month='09', year='2024'):
 )
 
     # Define a download directory; ensure this directory exists
-    download_dir = os.path.abspath("downloads")
+    download_dir = os.path.abspath(download_dir)
     if not os.path.exists(download_dir):
         os.makedirs(download_dir)
 
+    if NCUA_DOWNLOAD_URL:
+        download_credit_union_file(NCUA_DOWNLOAD_URL.format(month=month, year=year),
+                                   download_dir, f'ncua_{year}{month}.xlsx')
+        return
+
     # Configure Chrome options for automatic download
     chrome_options = webdriver.ChromeOptions()
     prefs = {
@@ -100,6 +137,7 @@ def get_credit_union_data(month='09', year='2024'):
 
 
 # Read the Excel file into a DataFrame
+@instrumented('transform.credit_union_prepare')
 def prepare_data(file_path, month='09', year='2024'):
     dim_sheet_name = 'ProfileGenInfo'
     fact_sheet_name = 'Total Accounts'
@@ -110,19 +148,84 @@ def prepare_data(file_path, month='09', year='2024'):
                                   sheet_name=fact_sheet_name).rename(columns={'Charter': 'charter_id', '010': 'assets', 'AS0009': 'deposits'})
     df_fact_sheet['year'] = int(year)
     df_fact_sheet['month'] = int(month)
+    record_file(file_path)
+    record_rows(len(df_fact_sheet))
     return (df_dim_sheet, df_fact_sheet)
 
 
+@instrumented('fetch.credit_union_cycle')
+def fetch_credit_union_cycle(month: str, year: str, output_dir: str) -> dict:
+    """
+    Download and prepare the credit union data for one call report cycle.
+
+    Each cycle downloads into its own directory so cycles can run in parallel.
+
+    Args:
+        month (str): Quarter-end month of the cycle, e.g. '09'.
+        year (str): Year of the cycle, e.g. '2024'.
+        output_dir (str): Directory to write the download and csv files to.
+
+    Returns:
+        dict: Paths of the prepared 'dim' and 'fact' csv files.
+
+    Raises:
+        RuntimeError: If no file was downloaded for the cycle.
+    """
+    download_dir = os.path.join(output_dir, 'downloads', f'{year}{month}')
+    get_credit_union_data(month, year, download_dir)
+    latest_file = get_latest_file(download_dir, '*.xlsx')
+    if latest_file is None:
+        raise RuntimeError(f"No credit union data was downloaded for {month}/{year}")
+
+    df_dim_sheet, df_fact_sheet = prepare_data(latest_file, month, year)
+    dim_path = os.path.join(output_dir, f'cu_dim_data_{year}{month}.csv')
+    fact_path = os.path.join(output_dir, f'cu_fact_data_{year}{month}.csv')
+    df_dim_sheet.to_csv(dim_path, index=False)
+    df_fact_sheet.to_csv(fact_path, index=False)
+    record_rows(len(df_fact_sheet))
+    record_file(latest_file)
+    return {'dim': dim_path, 'fact': fact_path}
+
+
+@instrumented('fetch.combine_credit_union_cycles')
+def combine_credit_union_cycles(cycle_files: list, output_dir: str) -> dict:
+    """
+    Combine the files of several cycles into one dim and one fact csv.
+
+    Args:
+        cycle_files (list): Dicts returned by fetch_credit_union_cycle.
+        output_dir (str): Directory to write the combined files to.
+
+    Returns:
+        dict: Paths of the combined 'dim' and 'fact' csv files.
+    """
+    cycle_files = sorted(cycle_files, key=lambda files: files['fact'])
+    # Keep the most recent profile of each credit union
+    dim_df = pd.concat([pd.read_csv(files['dim']) for files in cycle_files],
+                       ignore_index=True).drop_duplicates('CUNumber', keep='last')
+    fact_df = pd.concat([pd.read_csv(files['fact']) for files in cycle_files],
+                        ignore_index=True)
+
+    combined = {'dim': os.path.join(output_dir, 'cu_dim_data.csv'),
+                'fact': os.path.join(output_dir, 'cu_fact_data.csv')}
+    dim_df.to_csv(combined['dim'], index=False)
+    fact_df.to_csv(combined['fact'], index=False)
+    record_rows(len(fact_df))
+    record_file(combined['fact'])
+    return combined
+
+
 def main():
-    # month and year are used to determine what quarter to get data for
-    month = '09'
-    year = '2024'
-    CURRENT_TIMESTAMP = datetime.now().timestamp() # used to append to file
-    get_credit_union_data(month, year) # get the credit union data using selenium
-    latest_file = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai/downloads/', '*.xlsx') # get the excel file to process
-    df_dim_sheet, df_fact_sheet = prepare_data(latest_file) # process data
-    df_dim_sheet.to_csv(f'cu_dim_data_{CURRENT_TIMESTAMP}.csv', index=False)
-    df_fact_sheet.to_csv(f'cu_fact_data_{CURRENT_TIMESTAMP}.csv', index=False)
+    with pipeline_run('get_credit_union_data'):
+        # month and year are used to determine what quarter to get data for
+        month = '09'
+        year = '2024'
+        CURRENT_TIMESTAMP = datetime.now().timestamp() # used to append to file
+        get_credit_union_data(month, year) # get the credit union data using selenium
+        latest_file = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai/downloads/', '*.xlsx') # get the excel file to process
+        df_dim_sheet, df_fact_sheet = prepare_data(latest_file) # process data
+        df_dim_sheet.to_csv(f'cu_dim_data_{CURRENT_TIMESTAMP}.csv', index=False)
+        df_fact_sheet.to_csv(f'cu_fact_data_{CURRENT_TIMESTAMP}.csv', index=False)
 
 
 if __name__ == "__main__":
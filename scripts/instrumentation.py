@@ -0,0 +1,268 @@
+"""
+Instrumentation shared by the fetch, transform, load and merge steps.
+
+Wrap a step with ``@instrumented('stage.name')`` (or ``with track_stage(...)``)
+to record its wall time, rows, bytes, throughput and the process's peak RSS.
+Code inside a stage reports what it processed with ``record_rows`` and
+``record_bytes``. Long loops report progress through ``ProgressLogger``, which
+logs at most once every few seconds instead of once per row.
+
+Stages nest: each records its parent and depth. A stage's rows and bytes are
+what it recorded itself, or, if it recorded nothing, the sum over the stages
+nested directly in it. Run reports total only top-level stages so nothing is
+counted twice.
+
+Every finished stage is logged as one JSON line and kept for the run report,
+which ``pipeline_run`` writes to a JSON file when the pipeline step finishes.
+"""
+
+import contextlib
+import functools
+import glob
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger('alpha_rank.pipeline')
+
+# Where run reports are written when no explicit path is given
+REPORT_DIR = os.getenv('PIPELINE_REPORT_DIR', 'run_reports')
+
+_current_stage = ContextVar('current_stage', default=None)
+_stages = []
+_stages_lock = threading.Lock()
+# id of each open stage -> rows and bytes of the stages nested directly in it
+_open_children = {}
+
+
+def _log(event: dict) -> None:
+    # Make sure events are visible when a script runs outside Airflow, which
+    # configures its own logging.
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+    logger.setLevel(logging.INFO)
+    logger.info(json.dumps(event, default=str))
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB, or None if unknown."""
+    # On Linux ru_maxrss carries over the parent's peak through fork and exec,
+    # so a child of a large process would report the parent's memory. VmHWM does not.
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def record_rows(count: int) -> None:
+    """Add rows processed to the innermost active stage (no-op outside a stage)."""
+    stage = _current_stage.get()
+    if stage is not None:
+        stage['rows'] += count
+
+
+def record_bytes(count: int) -> None:
+    """Add bytes processed to the innermost active stage (no-op outside a stage)."""
+    stage = _current_stage.get()
+    if stage is not None:
+        stage['bytes'] += count
+
+
+def record_file(path: str) -> None:
+    """Add the size of a file read or written to the innermost active stage."""
+    if path and os.path.exists(path):
+        record_bytes(os.path.getsize(path))
+
+
+@contextlib.contextmanager
+def track_stage(name: str, **metadata):
+    """
+    Measure a block of pipeline work.
+
+    Args:
+        name (str): Stage name, e.g. 'fetch.bank_page' or 'merge.fact_banks'.
+        **metadata: Extra fields stored with the stage, e.g. offset=10000.
+
+    Yields:
+        dict: The stage record; ``record_rows``/``record_bytes`` update it.
+    """
+    parent = _current_stage.get()
+    stage = {'stage': name, 'parent': parent['stage'] if parent else None,
+             'depth': parent['depth'] + 1 if parent else 0,
+             'rows': 0, 'bytes': 0, **metadata}
+    with _stages_lock:
+        _open_children[id(stage)] = {'rows': 0, 'bytes': 0}
+    token = _current_stage.set(stage)
+    start = time.perf_counter()
+    stage['started_at'] = datetime.now(timezone.utc).isoformat()
+    stage['status'] = 'ok'
+    try:
+        yield stage
+    except BaseException as e:
+        stage['status'] = 'failed'
+        stage['error'] = repr(e)
+        raise
+    finally:
+        _current_stage.reset(token)
+        elapsed = time.perf_counter() - start
+        with _stages_lock:
+            child_totals = _open_children.pop(id(stage))
+            for key in ('rows', 'bytes'):
+                if not stage[key]:
+                    stage[key] = child_totals[key]
+                # The parent may already have finished if this ran in a thread it did not wait for
+                if parent is not None and id(parent) in _open_children:
+                    _open_children[id(parent)][key] += stage[key]
+        stage['wall_seconds'] = round(elapsed, 4)
+        stage['rows_per_second'] = round(stage['rows'] / elapsed, 1) if elapsed and stage['rows'] else None
+        stage['bytes_per_second'] = round(stage['bytes'] / elapsed, 1) if elapsed and stage['bytes'] else None
+        stage['peak_rss_mb'] = peak_rss_mb()
+        with _stages_lock:
+            _stages.append(stage)
+        _log({'event': 'stage_finished', **stage})
+
+
+def instrumented(name: str = None):
+    """
+    Decorator form of track_stage.
+
+    Args:
+        name (str): Stage name; defaults to the function's module and name.
+    """
+    def decorator(func):
+        stage_name = name or f'{func.__module__}.{func.__name__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class ProgressLogger:
+    """
+    Log progress of a long loop as structured events, sampled by time.
+
+    Args:
+        stage (str): Name of the work being tracked.
+        total (int): Expected number of items, if known.
+        every_seconds (float): Minimum time between progress events.
+    """
+
+    def __init__(self, stage: str, total: int = None, every_seconds: float = 5.0):
+        self.stage = stage
+        self.total = total
+        self.every_seconds = every_seconds
+        self.done = 0
+        self._start = time.perf_counter()
+        self._last_log = self._start
+
+    def update(self, count: int = 1, **fields) -> None:
+        """Advance by ``count`` items and log if enough time has passed."""
+        self.done += count
+        now = time.perf_counter()
+        if now - self._last_log >= self.every_seconds or (self.total and self.done >= self.total):
+            self._last_log = now
+            elapsed = now - self._start
+            _log({'event': 'progress', 'stage': self.stage, 'done': self.done,
+                  'total': self.total,
+                  'items_per_second': round(self.done / elapsed, 1) if elapsed else None,
+                  **fields})
+
+
+def collected_stages() -> list:
+    """Return a copy of every stage recorded in this process so far."""
+    with _stages_lock:
+        return list(_stages)
+
+
+@contextlib.contextmanager
+def pipeline_run(name: str, report_path: str = None):
+    """
+    Write a JSON run report covering every stage recorded inside the block.
+
+    Args:
+        name (str): Name of the pipeline step, e.g. 'get_bank_data'.
+        report_path (str): Where to write the report. Defaults to
+            REPORT_DIR/<name>_<timestamp>.json.
+
+    Yields:
+        str: The report path.
+    """
+    started_at = datetime.now(timezone.utc)
+    report_path = report_path or os.path.join(
+        REPORT_DIR, f"{name}_{started_at.strftime('%Y%m%dT%H%M%S')}.json")
+    first_stage = len(collected_stages())
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        yield report_path
+    except BaseException:
+        status = 'failed'
+        raise
+    finally:
+        stages = collected_stages()[first_stage:]
+        report = {
+            'pipeline': name,
+            'status': status,
+            'started_at': started_at.isoformat(),
+            'wall_seconds': round(time.perf_counter() - start, 4),
+            'peak_rss_mb': peak_rss_mb(),
+            # Nested stages are already counted in their top-level stage
+            'rows': sum(stage['rows'] for stage in stages if stage['depth'] == 0),
+            'bytes': sum(stage['bytes'] for stage in stages if stage['depth'] == 0),
+            'stages': stages,
+        }
+        os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        _log({'event': 'run_report_written', 'pipeline': name, 'path': report_path,
+              'status': status, 'wall_seconds': report['wall_seconds']})
+
+
+def merge_run_reports(report_dir: str, output_path: str) -> dict:
+    """
+    Combine per-task run reports (e.g. one per Airflow task) into one report.
+
+    Args:
+        report_dir (str): Directory holding the per-task JSON reports.
+        output_path (str): Path of the combined report.
+
+    Returns:
+        dict: The combined report.
+    """
+    reports = []
+    for path in sorted(glob.glob(os.path.join(report_dir, '*.json'))):
+        with open(path) as f:
+            reports.append(json.load(f))
+    combined = {
+        'status': 'ok' if all(r['status'] == 'ok' for r in reports) else 'failed',
+        'tasks': len(reports),
+        'task_seconds': round(sum(r['wall_seconds'] for r in reports), 4),
+        'rows': sum(r['rows'] for r in reports),
+        'bytes': sum(r['bytes'] for r in reports),
+        'max_peak_rss_mb': max((r['peak_rss_mb'] or 0 for r in reports), default=None),
+        'reports': reports,
+    }
+    with open(output_path, 'w') as f:
+        json.dump(combined, f, indent=2, default=str)
+    return combined
@@ -1,6 +1,20 @@
+from functools import lru_cache
 from google.cloud import storage
+from instrumentation import instrumented, record_file
 
 
+@lru_cache(maxsize=None)
+def get_storage_client():
+    """
+    Return a process-wide Cloud Storage client, creating it on first use.
+
+    Returns:
+        storage.Client: The shared Cloud Storage client.
+    """
+    return storage.Client()
+
+
+@instrumented('upload.gcs')
 def upload_file_to_gcs(bucket_name, source_file_path, destination_blob_name):
     """
     Uploads a file to a Google Cloud Storage bucket.
@@ -13,8 +27,8 @@ def upload_file_to_gcs(bucket_name, source_file_path, destination_blob_name):
     Returns:
         None
     """
-    # Initialize a client
-    storage_client = storage.Client()
+    # Reuse the shared client instead of building one per upload
+    storage_client = get_storage_client()
 
     # Get the bucket
     bucket = storage_client.bucket(bucket_name)
@@ -22,5 +36,6 @@ def upload_file_to_gcs(bucket_name, source_file_path, destination_blob_name):
     # Upload the file
     blob = bucket.blob(destination_blob_name)
     blob.upload_from_filename(source_file_path)
+    record_file(source_file_path)
 
     print(f"File {source_file_path} uploaded to {bucket_name}/{destination_blob_name}.")
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from instrumentation import instrumented, record_rows
+from load_data.load_to_bucket import upload_file_to_gcs
+
+DATASET_ID = 'alpha-rank-ai.financial_institutions'
+MAIN_TABLES = ['fact_banks', 'dim_banks', 'fact_credit_unions', 'dim_credit_unions']
+SNAPSHOT_BUCKET = 'alpha-rank-ai-bucket'
+SNAPSHOT_BLOB = 'schema/schema_snapshot.json'
+
+# Short descriptions sent to the LLM in place of the reflected DDL.
+TABLE_DESCRIPTIONS = {
+    'fact_banks': 'Quarterly assets and deposits per bank (FDIC).',
+    'dim_banks': 'One row per bank with its name and location (FDIC).',
+    'fact_credit_unions': 'Quarterly assets and deposits per credit union (NCUA).',
+    'dim_credit_unions': 'One row per credit union with its name and location (NCUA).',
+}
+COLUMN_DESCRIPTIONS = {
+    'charter_id': 'institution id; joins fact and dim tables of the same type',
+    'name': 'institution name',
+    'city': 'city of the headquarters',
+    'state': 'two-letter state code, e.g. TX',
+    'url': 'institution website',
+    'assets': 'total assets',
+    'deposits': 'total deposits',
+    'year': 'reporting year, e.g. 2024',
+    'month': 'quarter-end month: 3, 6, 9 or 12',
+}
+
+
+def build_schema_snapshot(client, sample_rows: int = 3) -> dict:
+    """
+    Build a compact, versioned description of the main tables.
+
+    Only table metadata and ``list_rows`` are used, so building a snapshot does
+    not run (or bill) any queries.
+
+    Args:
+        client (bigquery.Client): BigQuery client.
+        sample_rows (int): Number of sample rows to store per table.
+
+    Returns:
+        dict: Snapshot with a content hash ("version"), the data version it
+        describes and, per table, its columns, row count and sample rows.
+    """
+    tables = {}
+    modified = []
+    for table_name in MAIN_TABLES:
+        table = client.get_table(f'{DATASET_ID}.{table_name}')
+        modified.append(table.modified)
+        rows = client.list_rows(table, max_results=sample_rows)
+        tables[table_name] = {
+            'description': TABLE_DESCRIPTIONS.get(table_name, ''),
+            'num_rows': table.num_rows,
+            'columns': [{'name': field.name,
+                         'type': field.field_type,
+                         'description': COLUMN_DESCRIPTIONS.get(field.name, field.description or '')}
+                        for field in table.schema],
+            # Values are truncated the same way SQLDatabase does for sample rows.
+            'sample_rows': [[str(value)[:100] for value in row.values()] for row in rows],
+        }
+
+    content = json.dumps(tables, sort_keys=True, default=str)
+    return {
+        'version': hashlib.sha256(content.encode()).hexdigest()[:12],
+        # Must match how the backend computes its data version.
+        'data_version': max(modified).isoformat(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'tables': tables,
+    }
+
+
+@instrumented('publish.schema_snapshot')
+def refresh_schema_snapshot(client, bucket_name: str = SNAPSHOT_BUCKET,
+                            blob_name: str = SNAPSHOT_BLOB) -> dict:
+    """
+    Build a schema snapshot and upload it to GCS for the LLM backend.
+
+    Run after the main tables are merged so the snapshot describes the data
+    the backend will be querying.
+
+    Args:
+        client (bigquery.Client): BigQuery client.
+        bucket_name (str): Bucket the backend loads the snapshot from.
+        blob_name (str): Object name of the snapshot within the bucket.
+
+    Returns:
+        dict: The snapshot that was uploaded.
+    """
+    snapshot = build_schema_snapshot(client)
+    record_rows(len(snapshot['tables']))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        local_path = os.path.join(tmp_dir, 'schema_snapshot.json')
+        with open(local_path, 'w') as f:
+            json.dump(snapshot, f, indent=2, default=str)
+        upload_file_to_gcs(bucket_name, local_path, blob_name)
+
+    print(f"Schema snapshot {snapshot['version']} written for data version {snapshot['data_version']}.")
+    return snapshot
@@ -1,13 +1,77 @@
+from functools import lru_cache
 from google.cloud import bigquery
-from helper_functions import get_latest_file
+from instrumentation import instrumented, pipeline_run, record_bytes, record_rows
+from load_data.schema_snapshot import refresh_schema_snapshot
 
-# Initialize BigQuery client
-client = bigquery.Client()
 
+DATASET_ID = 'alpha-rank-ai.financial_institutions'
 
+# Asset tiers used by the summary tables: (tier name, lower bound, upper bound).
+# The LLM backend's fast-path router relies on these exact boundaries.
+ASSET_TIERS = [
+    ('under_100m', 0, 100000000),
+    ('100m_to_500m', 100000000, 500000000),
+    ('500m_to_1b', 500000000, 1000000000),
+    ('1b_to_10b', 1000000000, 10000000000),
+    ('10b_plus', 10000000000, None),
+]
+
+# Bank and credit union facts side by side, with each institution's state.
+# Dimension rows are deduplicated per charter since the dim merges keep history,
+# and fact rows per charter and quarter since reruns of the fact merges can
+# insert the same quarter again.
+INSTITUTION_FACTS_SQL = f"""
+  SELECT f.charter_id, f.year, f.month, 'bank' AS institution_type, d.state,
+         f.assets, f.deposits
+  FROM (SELECT CAST(charter_id AS STRING) AS charter_id, year, month,
+               MAX(assets) AS assets, MAX(deposits) AS deposits
+        FROM `{DATASET_ID}.fact_banks` GROUP BY 1, 2, 3) AS f
+  LEFT JOIN (SELECT CAST(charter_id AS STRING) AS charter_id, ANY_VALUE(state) AS state
+             FROM `{DATASET_ID}.dim_banks` GROUP BY 1) AS d
+  ON f.charter_id = d.charter_id
+  UNION ALL
+  SELECT f.charter_id, f.year, f.month, 'credit_union' AS institution_type, d.state,
+         f.assets, f.deposits
+  FROM (SELECT CAST(charter_id AS STRING) AS charter_id, year, month,
+               MAX(assets) AS assets, MAX(deposits) AS deposits
+        FROM `{DATASET_ID}.fact_credit_unions` GROUP BY 1, 2, 3) AS f
+  LEFT JOIN (SELECT CAST(charter_id AS STRING) AS charter_id, ANY_VALUE(state) AS state
+             FROM `{DATASET_ID}.dim_credit_unions` GROUP BY 1) AS d
+  ON f.charter_id = d.charter_id
+"""
+
+# Fact tables are partitioned by year and clustered by month, so a query that
+# filters on a quarter (e.g. the LLM backend's cost guard narrowing a query to
+# the latest one) only scans that year, and the dry-run estimate shows it.
+FACT_PARTITION_SQL = """PARTITION BY RANGE_BUCKET(year, GENERATE_ARRAY(2000, 2100, 1))
+CLUSTER BY month"""
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    """
+    Return a process-wide BigQuery client, creating it on first use.
+
+    The client is built lazily so importing this module (e.g. while Airflow
+    parses the DAG) does not resolve credentials or open connections.
+
+    Returns:
+        bigquery.Client: The shared BigQuery client.
+    """
+    return bigquery.Client()
+
+
+def record_query_job(query_job):
+    """Record the rows affected and bytes processed by a finished query job."""
+    record_rows(query_job.num_dml_affected_rows or 0)
+    record_bytes(query_job.total_bytes_processed or 0)
+
+
+@instrumented('load.bigquery_table')
 def write_csv_to_big_query_table(table_id: str, gcs_uri: str,
-                                 client=client,
+                                 client=None,
                                  autodetect=True):
+    client = client or get_client()
     # Configure job
     job_config = bigquery.LoadJobConfig(
         source_format=bigquery.SourceFormat.CSV,
@@ -22,12 +86,15 @@ def write_csv_to_big_query_table(table_id: str, gcs_uri: str,
 
     # Wait for the job to complete
     load_job.result()
+    record_rows(load_job.output_rows or 0)
+    record_bytes(load_job.input_file_bytes or 0)
 
     # Print confirmation
     print(f"Loaded {load_job.output_rows} rows into {table_id}.")
 
 
-def truncate_table(table_id, client=client):
+@instrumented('load.truncate_table')
+def truncate_table(table_id, client=None):
     """
     Truncate a BigQuery table by deleting all rows from it.
 
@@ -38,17 +105,51 @@ def truncate_table(table_id, client=client):
         None
     """
 
+    client = client or get_client()
+
     # SQL query to truncate the table
     query = f"TRUNCATE TABLE `{table_id}`"
 
     # Execute the query
     query_job = client.query(query)
     query_job.result()  # Wait for the job to complete
+    record_query_job(query_job)
 
     print(f"Table {table_id} has been truncated.")
 
 
-def fact_banks_merge_staging_to_main(client=client):
+@instrumented('load.partition_fact_table')
+def partition_fact_table(table_id, client=None):
+    """
+    Rebuild a fact table partitioned by year, unless it already is.
+
+    Args:
+        table_id (str): table name in following format: "your-project-id.your-dataset-id.your-table-id"
+
+    Returns:
+        bool: True if the table was rebuilt.
+    """
+    client = client or get_client()
+    if client.get_table(table_id).range_partitioning is not None:
+        return False
+
+    # Partitioning cannot be added to an existing table, so copy it in place
+    query = f"""CREATE OR REPLACE TABLE `{table_id}`
+{FACT_PARTITION_SQL}
+AS SELECT * FROM `{table_id}`
+"""
+    query_job = client.query(query)
+    query_job.result()  # Wait for the job to complete
+    record_query_job(query_job)
+
+    print(f"Table {table_id} is now partitioned by year.")
+    return True
+
+
+@instrumented('merge.fact_banks')
+def fact_banks_merge_staging_to_main(client=None):
+    client = client or get_client()
+    partition_fact_table(f'{DATASET_ID}.fact_banks', client)
     # Merge is used to keep old data and only add in or update new data
     query = """MERGE `alpha-rank-ai.financial_institutions.fact_banks` AS main
                 USING (
@@ -81,9 +182,12 @@ def fact_banks_merge_staging_to_main(client=client):
 
     query_job = client.query(query)
     query_job.result()  # Wait for the job to complete
+    record_query_job(query_job)
 
 
-def dim_banks_merge_staging_to_main(client=client):
+@instrumented('merge.dim_banks')
+def dim_banks_merge_staging_to_main(client=None):
+    client = client or get_client()
     # Merge is used to keep old data and only add in or update new data
     query = """MERGE `alpha-rank-ai.financial_institutions.dim_banks` AS main
 USING (
@@ -116,9 +220,13 @@ WHEN NOT MATCHED THEN
 
     query_job = client.query(query)
     query_job.result()  # Wait for the job to complete
+    record_query_job(query_job)
 
 
-def fact_credit_unions_merge_staging_to_main(client=client):
+@instrumented('merge.fact_credit_unions')
+def fact_credit_unions_merge_staging_to_main(client=None):
+    client = client or get_client()
+    partition_fact_table(f'{DATASET_ID}.fact_credit_unions', client)
     # Merge is used to keep old data and only add in or update new data
     query = """MERGE `alpha-rank-ai.financial_institutions.fact_credit_unions` AS main
 USING (
@@ -151,9 +259,12 @@ WHEN NOT MATCHED THEN
 
     query_job = client.query(query)
     query_job.result()  # Wait for the job to complete
+    record_query_job(query_job)
 
 
-def dim_credit_unions_merge_staging_to_main(client=client):
+@instrumented('merge.dim_credit_unions')
+def dim_credit_unions_merge_staging_to_main(client=None):
+    client = client or get_client()
     # Merge is used to keep old data and only add in or update new data
     query = """MERGE `alpha-rank-ai.financial_institutions.dim_credit_unions` AS main
 USING (
@@ -186,14 +297,110 @@ WHEN NOT MATCHED THEN
 
     query_job = client.query(query)
     query_job.result()  # Wait for the job to complete
+    record_query_job(query_job)
+
+
+@instrumented('merge.summary_asset_tiers')
+def asset_tier_summary_to_table(client=None):
+    """
+    Rebuild summary_asset_tiers: institution counts and totals per quarter,
+    institution type and asset tier.
+    """
+    client = client or get_client()
+    tier_cases = '\n'.join(
+        f"      WHEN assets >= {low}" + (f" AND assets < {high}" if high else '')
+        + f" THEN STRUCT('{name}' AS name, {low} AS min_assets, "
+        + (f"{high}" if high else 'CAST(NULL AS INT64)') + " AS max_assets)"
+        for name, low, high in ASSET_TIERS)
+    query = f"""CREATE OR REPLACE TABLE `{DATASET_ID}.summary_asset_tiers` AS
+SELECT
+  year,
+  month,
+  institution_type,
+  tier.name AS asset_tier,
+  tier.min_assets,
+  tier.max_assets,
+  COUNT(DISTINCT charter_id) AS institution_count,
+  SUM(assets) AS total_assets,
+  SUM(deposits) AS total_deposits
+FROM (
+  SELECT *,
+    CASE
+{tier_cases}
+    END AS tier
+  FROM ({INSTITUTION_FACTS_SQL})
+  WHERE assets IS NOT NULL
+)
+GROUP BY year, month, institution_type, asset_tier, tier.min_assets, tier.max_assets
+"""
+
+    query_job = client.query(query)
+    query_job.result()  # Wait for the job to complete
+    record_query_job(query_job)
+
+
+@instrumented('merge.summary_state_totals')
+def state_summary_to_table(client=None):
+    """
+    Rebuild summary_state_totals: institution counts and totals per quarter,
+    institution type and state.
+    """
+    client = client or get_client()
+    query = f"""CREATE OR REPLACE TABLE `{DATASET_ID}.summary_state_totals` AS
+SELECT
+  year,
+  month,
+  institution_type,
+  state,
+  COUNT(DISTINCT charter_id) AS institution_count,
+  SUM(assets) AS total_assets,
+  SUM(deposits) AS total_deposits
+FROM ({INSTITUTION_FACTS_SQL})
+GROUP BY year, month, institution_type, state
+"""
+
+    query_job = client.query(query)
+    query_job.result()  # Wait for the job to complete
+    record_query_job(query_job)
+
+
+@instrumented('merge.summary_institution_counts')
+def institution_count_summary_to_table(client=None):
+    """
+    Rebuild summary_institution_counts: bank vs. credit union counts and
+    totals per quarter.
+    """
+    client = client or get_client()
+    query = f"""CREATE OR REPLACE TABLE `{DATASET_ID}.summary_institution_counts` AS
+SELECT
+  year,
+  month,
+  institution_type,
+  COUNT(DISTINCT charter_id) AS institution_count,
+  SUM(assets) AS total_assets,
+  SUM(deposits) AS total_deposits
+FROM ({INSTITUTION_FACTS_SQL})
+GROUP BY year, month, institution_type
+"""
+
+    query_job = client.query(query)
+    query_job.result()  # Wait for the job to complete
+    record_query_job(query_job)
 
 
 def main():
-    # Populate main data tables with new data
-    fact_banks_merge_staging_to_main()
-    dim_banks_merge_staging_to_main()
-    fact_credit_unions_merge_staging_to_main()
-    dim_credit_unions_merge_staging_to_main()
+    with pipeline_run('write_to_table'):
+        # Populate main data tables with new data
+        fact_banks_merge_staging_to_main()
+        dim_banks_merge_staging_to_main()
+        fact_credit_unions_merge_staging_to_main()
+        dim_credit_unions_merge_staging_to_main()
+        # Rebuild per-quarter summaries used to answer common questions directly
+        asset_tier_summary_to_table()
+        state_summary_to_table()
+        institution_count_summary_to_table()
+        # Publish the schema snapshot the LLM backend builds its prompts from
+        refresh_schema_snapshot(get_client())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,129 @@
+"""
+Load-test the FDIC page fetcher and report throughput and tail latency.
+
+Pages are fetched with fetch_data.get_bank_data.get_institution_data_json, so
+retries and connection pooling behave as they do in the pipeline. By default
+the local stand-in server (source_stub_server.py) is started in-process with
+the given latency, error and throttling settings; pass --base-url to target
+a server that is already running instead. The in-process server shares the
+interpreter with the fetch threads, so run it separately for absolute numbers.
+
+Usage:
+    python scripts/load_test_fetch.py --concurrency 1,4,8,16 --latency-ms 150
+    python scripts/load_test_fetch.py --rate-limit 10 --error-rate 0.05 --pages 40
+    python scripts/load_test_fetch.py --base-url http://localhost:8765/api
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from source_stub_server import add_stub_arguments, make_server, stub_from_args
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_level(get_bank_data, dataset: str, offsets: list, concurrency: int) -> dict:
+    """
+    Fetch every offset with ``concurrency`` threads.
+
+    Returns:
+        dict: Throughput, latency percentiles (ms) and error count for the level.
+    """
+    url, fields = get_bank_data.DATASETS[dataset]
+    latencies = []
+    records = []
+    errors = []
+
+    def fetch(offset):
+        start = time.perf_counter()
+        try:
+            page = get_bank_data.get_institution_data_json(url, get_bank_data.PAGE_SIZE, offset, *fields)
+        except RuntimeError as e:
+            errors.append(str(e))
+            return
+        latencies.append((time.perf_counter() - start) * 1000)
+        records.append(len(page.get('data', [])))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(fetch, offsets))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'concurrency': concurrency,
+        'pages': len(latencies),
+        'errors': len(errors),
+        'seconds': round(elapsed, 3),
+        'pages_per_second': round(len(latencies) / elapsed, 2),
+        'records_per_second': round(sum(records) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 1) if latencies else None,
+        'max_ms': round(max(latencies), 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', default='1,4,8,16',
+                        help='comma-separated numbers of concurrent fetches to try')
+    parser.add_argument('--dataset', choices=['institutions', 'financials'], default='financials')
+    parser.add_argument('--pages', type=int, default=20,
+                        help='pages fetched per concurrency level (offsets wrap around)')
+    parser.add_argument('--base-url', help='FDIC-style API to target instead of an in-process stub')
+    parser.add_argument('--report', help='also write the results to this JSON file')
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    if args.base_url is None:
+        server = make_server(stub_from_args(args))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        args.base_url = f'http://127.0.0.1:{server.server_port}/api'
+    # Read by get_bank_data at import time
+    os.environ['FDIC_API_BASE_URL'] = args.base_url
+    from fetch_data import get_bank_data
+
+    # One stage event per page would drown out the results
+    logging.getLogger('alpha_rank.pipeline').disabled = True
+
+    page_offsets = get_bank_data.get_page_offsets(args.dataset)
+    offsets = [page_offsets[i % len(page_offsets)] for i in range(args.pages)]
+    print(f"Fetching {len(offsets)} {args.dataset} pages from {args.base_url} "
+          f"({len(page_offsets)} available)")
+
+    results = []
+    for concurrency in (int(c) for c in args.concurrency.split(',')):
+        stats_before = dict(server.stub.stats) if server else {}
+        result = run_level(get_bank_data, args.dataset, offsets, concurrency)
+        line = (f"concurrency {concurrency:>3}: {result['pages_per_second']:>7.2f} pages/s, "
+                f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, "
+                f"{result['errors']} failed pages")
+        if server:
+            # Server-side counts show how many responses were retried
+            result['throttled_responses'] = server.stub.stats['throttled'] - stats_before.get('throttled', 0)
+            result['error_responses'] = server.stub.stats['errors'] - stats_before.get('errors', 0)
+            line += f", {result['throttled_responses']} 429s, {result['error_responses']} 503s"
+        results.append(result)
+        print(line)
+
+    if server:
+        server.shutdown()
+        server.server_close()
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'base_url': args.base_url, 'dataset': args.dataset, 'levels': results},
+                      f, indent=2)
+        print(f"Wrote {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Profile how long it takes to import each pipeline module and flag regressions.
+
+Each module is imported in a fresh interpreter with ``python -X importtime`` so
+results are not skewed by modules already loaded in this process. Imports are
+repeated and the fastest is kept, since one slow run is usually disk noise. A module
+fails the check when its cumulative import time exceeds its budget in
+import_budgets.json, when it has no budget there yet (record one with
+--update), or when importing it pulls in a module that is meant to be loaded
+lazily (e.g. the LangChain stack or the BigQuery SDK).
+
+Usage:
+    python scripts/profile_imports.py            # check against budgets
+    python scripts/profile_imports.py --update   # re-baseline budgets
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGETS_PATH = os.path.join(REPO_ROOT, 'scripts', 'import_budgets.json')
+
+# Headroom applied to measured times when re-baselining budgets. The absolute
+# slack keeps cold-cache noise from failing modules that import quickly.
+BUDGET_HEADROOM = 1.5
+BUDGET_SLACK_MS = 300
+
+# module name -> (directory to put on sys.path, modules that must stay unloaded)
+TARGETS = {
+    'backend': ('llm/backend', ['langchain', 'langchain_community',
+                                'langchain_experimental',
+                                'google.cloud.bigquery']),
+    'load_data.write_to_table': ('scripts', []),
+    'load_data.load_to_bucket': ('scripts', []),
+    'transform_data.transform_bank_data': ('scripts', []),
+    'transform_data.transform_cu_data': ('scripts', []),
+}
+
+
+def profile_import(module: str, path: str) -> tuple:
+    """
+    Import a module in a subprocess and collect per-module import timings.
+
+    Args:
+        module (str): Dotted module name to import.
+        path (str): Directory, relative to the repo root, to put on sys.path.
+
+    Returns:
+        tuple: (cumulative import time of ``module`` in ms,
+                set of every module name imported along the way)
+
+    Raises:
+        RuntimeError: If the module cannot be imported.
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.join(REPO_ROOT, path))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                             f'import {module}'],
+                            cwd=os.path.join(REPO_ROOT, path), env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to import {module}: {result.stderr.strip().splitlines()[-1:]}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        # Lines look like: "import time:       123 |       4567 | package.module"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = int(cumulative) / 1000
+
+    return timings.get(module, 0.0), set(timings)
+
+
+def load_budgets() -> dict:
+    """Load the per-module import budgets (ms), or an empty dict if none exist."""
+    if not os.path.exists(BUDGETS_PATH):
+        return {}
+    with open(BUDGETS_PATH) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--update', action='store_true',
+                        help='write measured times (plus headroom) as the new budgets')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='imports per module; the fastest is kept')
+    args = parser.parse_args()
+
+    budgets = load_budgets()
+    measured = {}
+    failures = []
+
+    for module, (path, lazy_modules) in TARGETS.items():
+        try:
+            runs = [profile_import(module, path) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            # A module that cannot be imported is a regression, not a skip
+            print(f"FAIL  {module}: {e}")
+            failures.append(str(e))
+            continue
+        elapsed_ms = min(elapsed for elapsed, _ in runs)
+        imported = set().union(*(modules for _, modules in runs))
+        measured[module] = elapsed_ms
+
+        eager = sorted(m for m in imported
+                       if any(m == lazy or m.startswith(lazy + '.') for lazy in lazy_modules))
+        budget = budgets.get(module)
+        status = 'OK'
+        if eager:
+            status = 'FAIL'
+            failures.append(f"{module} eagerly imports {', '.join(eager[:5])}")
+        if budget is None and not args.update:
+            # An unbudgeted module could never regress, so treat it as a failure
+            status = 'FAIL'
+            failures.append(f"{module} has no budget; run with --update to record one")
+        elif budget is not None and elapsed_ms > budget and not args.update:
+            status = 'FAIL'
+            failures.append(f"{module} took {elapsed_ms:.0f}ms (budget {budget:.0f}ms)")
+        budget_str = f"{budget:.0f}ms" if budget is not None else 'n/a'
+        print(f"{status:5} {module}: {elapsed_ms:.0f}ms (budget {budget_str})")
+
+    if args.update:
+        budgets.update({m: round(max(t * BUDGET_HEADROOM, t + BUDGET_SLACK_MS))
+                        for m, t in measured.items()})
+        with open(BUDGETS_PATH, 'w') as f:
+            json.dump(budgets, f, indent=2, sort_keys=True)
+        print(f"Updated budgets in {BUDGETS_PATH}")
+
+    if failures:
+        print("\nImport-time regressions:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+"""
+Local stand-in for the FDIC API and the NCUA download, for offline fetch testing.
+
+Routes:
+    /api/institutions, /api/financials   FDIC-style pages with meta.total and
+                                         limit/offset/fields (limit <= 10,000)
+    /ncua/CallReportData.xlsx            workbook with the sheets prepare_data reads
+    /stats                               requests served, throttled and failed
+
+Institutions are the rows of the checked-in bank_dim_data.csv repeated --scale
+times with unique ids; financials hold one synthetic row per institution per
+quarter. The workbook is built from cu_dim_data.csv and cu_fact_data.csv on
+first request. Latency, injected errors and throttling are configurable so
+pagination, retries and fetch concurrency can be tuned without the real APIs.
+
+Usage:
+    python scripts/source_stub_server.py --port 8765 --latency-ms 200 --rate-limit 20
+    FDIC_API_BASE_URL=http://localhost:8765/api \\
+    NCUA_DOWNLOAD_URL=http://localhost:8765/ncua/CallReportData.xlsx \\
+        python scripts/fetch_data/get_bank_data.py
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from synthetic_data import BANK_FACT_QUARTERS, ID_STRIDE, write_ncua_xlsx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_LIMIT = 10000  # Same cap as the FDIC API
+DEFAULT_LIMIT = 10
+NCUA_PATH = '/ncua/CallReportData.xlsx'
+
+
+class SourceStub:
+    """
+    Data and simulated behavior shared by every request handler thread.
+
+    Args:
+        scale (int): Times the checked-in institutions are repeated.
+        latency_ms (float): Added to every accepted request.
+        jitter_ms (float): Random extra latency, up to this much.
+        error_rate (float): Fraction of accepted requests answered with a 503.
+        rate_limit (float): Requests per second allowed before answering 429;
+            None disables throttling.
+    """
+
+    def __init__(self, scale: int = 1, latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0.0, rate_limit: float = None):
+        with open(os.path.join(REPO_ROOT, 'bank_dim_data.csv'), newline='') as f:
+            # Drop the unnamed index column written by pandas
+            self.banks = [{k: v for k, v in row.items() if k} for row in csv.DictReader(f)]
+        self.scale = scale
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._tokens = rate_limit or 0
+        self._last_refill = time.monotonic()
+        self._xlsx = None
+        self._xlsx_lock = threading.Lock()
+
+    @property
+    def institution_count(self) -> int:
+        return len(self.banks) * self.scale
+
+    def total(self, dataset: str) -> int:
+        """Return the number of records in a dataset."""
+        if dataset == 'institutions':
+            return self.institution_count
+        return self.institution_count * len(BANK_FACT_QUARTERS)
+
+    def institution(self, position: int) -> dict:
+        """Return the institution at a position, with an id unique across copies."""
+        copy, row = divmod(position, len(self.banks))
+        record = dict(self.banks[row])
+        record['ID'] = str(int(record['ID']) + copy * ID_STRIDE)
+        return record
+
+    def financial(self, position: int) -> dict:
+        """Return a deterministic quarterly financials record."""
+        quarter, institution = divmod(position, self.institution_count)
+        report_date = BANK_FACT_QUARTERS[quarter]
+        rng = random.Random(position)
+        assets = round(rng.lognormvariate(12, 2))
+        return {
+            'ID': f"{self.institution(institution)['ID']}_{report_date}",
+            'REPDTE': str(report_date),
+            'ASSET': assets,
+            'DEP': round(assets * rng.uniform(0.5, 0.9)),
+        }
+
+    def page(self, dataset: str, limit: int, offset: int, fields: list) -> dict:
+        """Build an FDIC-style response body for one page of a dataset."""
+        total = self.total(dataset)
+        get_record = self.institution if dataset == 'institutions' else self.financial
+        data = []
+        for position in range(offset, min(offset + limit, total)):
+            record = get_record(position)
+            if fields:
+                # The API always returns the record id
+                record = {k: v for k, v in record.items() if k in fields or k == 'ID'}
+            data.append({'data': record, 'score': 0})
+        return {'meta': {'total': total, 'parameters': {'limit': limit, 'offset': offset,
+                                                        'fields': ','.join(fields)}},
+                'data': data,
+                'totals': {'count': total}}
+
+    def take_token(self) -> bool:
+        """Return False if the request should be throttled (token bucket)."""
+        if self.rate_limit is None:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit,
+                               self._tokens + (now - self._last_refill) * self.rate_limit)
+            self._last_refill = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def ncua_xlsx(self) -> bytes:
+        """Return the NCUA workbook, building it on first use (needs pandas and openpyxl)."""
+        with self._xlsx_lock:
+            if self._xlsx is None:
+                import pandas as pd
+
+                cu_dim = pd.read_csv(os.path.join(REPO_ROOT, 'cu_dim_data.csv'))
+                cu_fact = pd.read_csv(os.path.join(REPO_ROOT, 'cu_fact_data.csv'))
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    path = os.path.join(tmp_dir, 'CallReportData.xlsx')
+                    write_ncua_xlsx(cu_dim, cu_fact, path)
+                    with open(path, 'rb') as f:
+                        self._xlsx = f.read()
+            return self._xlsx
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+
+class SourceStubHandler(BaseHTTPRequestHandler):
+    """Serve one request against ``self.server.stub``."""
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real APIs
+
+    def _send(self, status: int, body: bytes, content_type: str = 'application/json',
+              headers: dict = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None) -> None:
+        self._send(status, json.dumps(payload).encode(), headers=headers)
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            self._send_json(200, dict(stub.stats))
+            return
+
+        stub.count('requests')
+        if not stub.take_token():
+            stub.count('throttled')
+            self._send_json(429, {'error': 'Too many requests'}, {'Retry-After': '1'})
+            return
+        delay_ms = stub.latency_ms + random.uniform(0, stub.jitter_ms)
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        if random.random() < stub.error_rate:
+            stub.count('errors')
+            self._send_json(503, {'error': 'Injected failure'})
+            return
+
+        if url.path in ('/api/institutions', '/api/financials'):
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            try:
+                limit = int(params.get('limit', DEFAULT_LIMIT))
+                offset = int(params.get('offset', 0))
+            except ValueError:
+                stub.count('bad_requests')
+                self._send_json(400, {'error': 'limit and offset must be integers'})
+                return
+            if not 0 <= limit <= MAX_LIMIT or offset < 0:
+                stub.count('bad_requests')
+                self._send_json(400, {'error': f'limit must be between 0 and {MAX_LIMIT}'})
+                return
+            fields = [f for f in params.get('fields', '').split(',') if f]
+            stub.count('pages')
+            self._send_json(200, stub.page(url.path.rsplit('/', 1)[-1], limit, offset, fields))
+        elif url.path == NCUA_PATH:
+            stub.count('downloads')
+            self._send(200, stub.ncua_xlsx(),
+                       'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        else:
+            self._send_json(404, {'error': f'Unknown path {url.path}'})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(stub: SourceStub, host: str = '127.0.0.1', port: int = 0,
+                verbose: bool = False) -> ThreadingHTTPServer:
+    """
+    Create (but do not start) a threaded server for a stub.
+
+    Args:
+        stub (SourceStub): Data and behavior to serve.
+        host (str): Interface to bind.
+        port (int): Port to bind; 0 picks a free one (see ``server.server_port``).
+        verbose (bool): Log every request.
+
+    Returns:
+        ThreadingHTTPServer: Call ``serve_forever()`` to start it.
+    """
+    server = ThreadingHTTPServer((host, port), SourceStubHandler)
+    server.daemon_threads = True
+    server.stub = stub
+    server.verbose = verbose
+    return server
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options that configure a SourceStub to a parser."""
+    parser.add_argument('--scale', type=int, default=1,
+                        help='times the checked-in institutions are repeated')
+    parser.add_argument('--latency-ms', type=float, default=0,
+                        help='latency added to every accepted request')
+    parser.add_argument('--jitter-ms', type=float, default=0,
+                        help='random extra latency, up to this much')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of accepted requests answered with a 503')
+    parser.add_argument('--rate-limit', type=float,
+                        help='requests per second allowed before answering 429')
+
+
+def stub_from_args(args: argparse.Namespace) -> SourceStub:
+    """Create a SourceStub from the options added by add_stub_arguments."""
+    return SourceStub(args.scale, args.latency_ms, args.jitter_ms, args.error_rate,
+                      args.rate_limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = make_server(stub_from_args(args), args.host, args.port, args.verbose)
+    base_url = f'http://{args.host}:{server.server_port}'
+    print(f"Serving on {base_url}")
+    print(f"  FDIC_API_BASE_URL={base_url}/api")
+    print(f"  NCUA_DOWNLOAD_URL={base_url}{NCUA_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
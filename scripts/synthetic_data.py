@@ -0,0 +1,60 @@
+"""
+Synthetic scale-ups of the checked-in data, shared by the benchmark and the source stub.
+
+Copies of an institution get ids offset by ID_STRIDE so every synthetic
+institution is unique. The repo has no raw bank fact file, so quarterly bank
+financials are synthesized for BANK_FACT_QUARTERS.
+"""
+
+# Added to ids per copy so every synthetic institution has a unique id
+ID_STRIDE = 10_000_000
+# Quarters in the synthetic bank fact file, as FDIC REPDTE values
+BANK_FACT_QUARTERS = [20231231, 20240331, 20240630, 20240930]
+# Excel sheets hold at most this many data rows
+XLSX_MAX_ROWS = 1_048_575
+
+
+def write_copies(base, path: str, scale: int, id_column: str, index: bool) -> None:
+    """Write ``scale`` copies of ``base`` to a csv, offsetting ids per copy."""
+    for copy in range(scale):
+        df = base.copy()
+        df[id_column] = df[id_column] + copy * ID_STRIDE
+        df.index = df.index + copy * len(base)
+        df.to_csv(path, mode='w' if copy == 0 else 'a', header=copy == 0, index=index)
+
+
+def write_bank_fact(bank_ids, path: str, scale: int) -> None:
+    """Write a multi-quarter bank fact csv shaped like combined FDIC financials pages."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    base = pd.DataFrame({
+        'ID': np.tile(bank_ids.to_numpy(), len(BANK_FACT_QUARTERS)),
+        'REPDTE': np.repeat(BANK_FACT_QUARTERS, len(bank_ids)),
+    })
+    for copy in range(scale):
+        assets = rng.lognormal(12, 2, len(base)).round()
+        df = pd.DataFrame({
+            'DEP': (assets * rng.uniform(0.5, 0.9, len(base))).round(),
+            'ASSET': assets,
+            'REPDTE': base['REPDTE'],
+            # The API suffixes the report date to the id, e.g. "3510_20240930"
+            'ID': (base['ID'] + copy * ID_STRIDE).astype(str) + '_' + base['REPDTE'].astype(str),
+        }, index=base.index + copy * len(base))
+        df.to_csv(path, mode='w' if copy == 0 else 'a', header=copy == 0)
+
+
+def write_ncua_xlsx(cu_dim, cu_fact, path: str, scale: int = 1) -> None:
+    """Write an xlsx with the two sheets prepare_data reads from an NCUA download."""
+    import pandas as pd
+
+    def scaled(base, id_column):
+        return pd.concat([base.assign(**{id_column: base[id_column] + copy * ID_STRIDE})
+                          for copy in range(scale)], ignore_index=True)
+
+    fact = cu_fact.drop(columns=['year', 'month']).rename(
+        columns={'charter_id': 'Charter', 'assets': '010', 'deposits': 'AS0009'})
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        scaled(cu_dim, 'CUNumber').to_excel(writer, sheet_name='ProfileGenInfo', index=False)
+        scaled(fact, 'Charter').to_excel(writer, sheet_name='Total Accounts', index=False)
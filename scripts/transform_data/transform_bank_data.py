@@ -1,6 +1,8 @@
+import os
 import pandas as pd
 from datetime import datetime
 from helper_functions import get_latest_file
+from instrumentation import instrumented, pipeline_run, record_file, record_rows
 from load_data.load_to_bucket import upload_file_to_gcs
 from load_data.write_to_table import truncate_table, write_csv_to_big_query_table
 
@@ -78,6 +80,7 @@ def state_to_abbreviation(state_name: str) -> str:
     return mapping.get(normalized_state, None)
 
 
+@instrumented('transform.bank_dim')
 def format_bank_dim_data(input_file_path: str, output_file_path: str):
     """Formats the csv containing the bank's dimensional data
 
@@ -96,8 +99,11 @@ def format_bank_dim_data(input_file_path: str, output_file_path: str):
     df['state'] = df['state'].apply(state_to_abbreviation)
     # Save to new file
     df.to_csv(output_file_path)
+    record_rows(len(df))
+    record_file(input_file_path)
 
 
+@instrumented('transform.bank_fact')
 def format_bank_fact_data(input_file_path: str, output_file_path: str):
     """Formats the csv containing the bank's fact data
 
@@ -123,38 +129,83 @@ def format_bank_fact_data(input_file_path: str, output_file_path: str):
     df[['assets', 'deposits']].fillna(0, inplace=True)
     # Save to new file
     df.to_csv(output_file_path)
+    record_rows(len(df))
+    record_file(input_file_path)
+
+
+def transform_bank_files(bank_dim_path: str, bank_fact_path: str,
+                         output_dir: str, timestamp: str) -> dict:
+    """Formats the bank dimensional and fact csv files
+
+    Args:
+        bank_dim_path (str): file path to csv containing the bank dimensional data
+        bank_fact_path (str): file path to csv containing the bank fact data
+        output_dir (str): directory to save the formatted files to
+        timestamp (str): suffix for the formatted file names
+
+    Returns:
+        dict: paths of the formatted 'dim' and 'fact' files
+    """
+    formatted = {
+        'dim': os.path.join(output_dir, f'formatted_bank_dim_data_{timestamp}.csv'),
+        'fact': os.path.join(output_dir, f'formatted_bank_fact_data_{timestamp}.csv'),
+    }
+    format_bank_dim_data(bank_dim_path, formatted['dim'])
+    format_bank_fact_data(bank_fact_path, formatted['fact'])
+    return formatted
+
+
+@instrumented('load.bank_staging')
+def load_bank_files_to_staging(formatted: dict, bucket_name: str = 'alpha-rank-ai-bucket'):
+    """Uploads the formatted bank files to GCS and reloads the staging tables
+
+    Args:
+        formatted (dict): paths of the formatted 'dim' and 'fact' files
+        bucket_name (str): GCS bucket used to persist the files
+    """
+    for kind, table_id in (('dim', 'alpha-rank-ai.financial_institutions.dim_banks_staging'),
+                           ('fact', 'alpha-rank-ai.financial_institutions.fact_banks_staging')):
+        blob_name = os.path.basename(formatted[kind])
+        # Upload file to GCS bucket to persist it
+        upload_file_to_gcs(bucket_name, formatted[kind], blob_name)
+        # Truncate staging table before repopulating
+        truncate_table(table_id)
+        write_csv_to_big_query_table(table_id, f'gs://{bucket_name}/{blob_name}',
+                                     autodetect=False)
 
 
 def main():
-    CURRENT_TIMESTAMP = datetime.now().timestamp() # create timestamp to append to file name
-    BUCKET_NAME = 'alpha-rank-ai-bucket'
-    BANK_DIM_OUTPUT_PATH = f'formatted_bank_dim_data_{CURRENT_TIMESTAMP}.csv'
-    BANK_FACT_OUTPUT_PATH = f'formatted_bank_fact_data_{CURRENT_TIMESTAMP}.csv'
-    LATEST_BANK_DIM_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'bank_dim_data*.csv')
-    LATEST_BANK_FACT_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'bank_fact_data*.csv')
-    LATEST_FORMATTED_BANK_DIM_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'formatted_bank_dim_data.csv*.csv')
-    LATEST_FORMATTED_BANK_FACT_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'formatted_bank_fact_data.csv*.csv')
-
-    # Format the data files
-    format_bank_dim_data(LATEST_BANK_DIM_FILE_PATH,
-                         BANK_DIM_OUTPUT_PATH)
-    format_bank_fact_data(LATEST_BANK_FACT_FILE_PATH,
-                          BANK_FACT_OUTPUT_PATH)
-    # Upload files to GCS bucket to persist files
-    upload_file_to_gcs(BUCKET_NAME, LATEST_FORMATTED_BANK_DIM_FILE_PATH, BANK_DIM_OUTPUT_PATH)
-    upload_file_to_gcs(BUCKET_NAME, LATEST_FORMATTED_BANK_FACT_FILE_PATH, BANK_FACT_OUTPUT_PATH)
-
-    # Truncate bank dim data staging table before repopulating
-    truncate_table('alpha-rank-ai.financial_institutions.dim_banks_staging')
-    write_csv_to_big_query_table('alpha-rank-ai.financial_institutions.dim_banks_staging', 
-                                 f'gs://{BUCKET_NAME}/{LATEST_FORMATTED_BANK_DIM_FILE_PATH}',
-                                 autodetect=False)
-
-    # Truncate bank fact data staging table before repopulating
-    truncate_table('alpha-rank-ai.financial_institutions.fact_banks_staging')
-    write_csv_to_big_query_table('alpha-rank-ai.financial_institutions.fact_banks_staging',
-                                 f'gs://{BUCKET_NAME}/{LATEST_FORMATTED_BANK_FACT_FILE_PATH}',
-                                 autodetect=False)
+    with pipeline_run('transform_bank_data'):
+        CURRENT_TIMESTAMP = datetime.now().timestamp() # create timestamp to append to file name
+        BUCKET_NAME = 'alpha-rank-ai-bucket'
+        BANK_DIM_OUTPUT_PATH = f'formatted_bank_dim_data_{CURRENT_TIMESTAMP}.csv'
+        BANK_FACT_OUTPUT_PATH = f'formatted_bank_fact_data_{CURRENT_TIMESTAMP}.csv'
+        LATEST_BANK_DIM_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'bank_dim_data*.csv')
+        LATEST_BANK_FACT_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'bank_fact_data*.csv')
+        LATEST_FORMATTED_BANK_DIM_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'formatted_bank_dim_data.csv*.csv')
+        LATEST_FORMATTED_BANK_FACT_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'formatted_bank_fact_data.csv*.csv')
+
+        # Format the data files
+        format_bank_dim_data(LATEST_BANK_DIM_FILE_PATH,
+                             BANK_DIM_OUTPUT_PATH)
+        format_bank_fact_data(LATEST_BANK_FACT_FILE_PATH,
+                              BANK_FACT_OUTPUT_PATH)
+        # Upload files to GCS bucket to persist files
+        upload_file_to_gcs(BUCKET_NAME, LATEST_FORMATTED_BANK_DIM_FILE_PATH, BANK_DIM_OUTPUT_PATH)
+        upload_file_to_gcs(BUCKET_NAME, LATEST_FORMATTED_BANK_FACT_FILE_PATH, BANK_FACT_OUTPUT_PATH)
+
+        # Truncate bank dim data staging table before repopulating
+        truncate_table('alpha-rank-ai.financial_institutions.dim_banks_staging')
+        write_csv_to_big_query_table('alpha-rank-ai.financial_institutions.dim_banks_staging', 
+                                     f'gs://{BUCKET_NAME}/{LATEST_FORMATTED_BANK_DIM_FILE_PATH}',
+                                     autodetect=False)
+
+        # Truncate bank fact data staging table before repopulating
+        truncate_table('alpha-rank-ai.financial_institutions.fact_banks_staging')
+        write_csv_to_big_query_table('alpha-rank-ai.financial_institutions.fact_banks_staging',
+                                     f'gs://{BUCKET_NAME}/{LATEST_FORMATTED_BANK_FACT_FILE_PATH}',
+                                     autodetect=False)
+
 
 if __name__ == '__main__':
     main()
@@ -1,9 +1,12 @@
+import os
 import pandas as pd
 from datetime import datetime
 from helper_functions import get_latest_file
+from instrumentation import instrumented, pipeline_run, record_file, record_rows
 from load_data.load_to_bucket import upload_file_to_gcs
 from load_data.write_to_table import truncate_table, write_csv_to_big_query_table
 
+@instrumented('transform.credit_union_fact')
 def transform_fact_data(input_file_path: str, output_file_path: str):
     """Formats the csv containing the cu's fact data
 
@@ -16,8 +19,11 @@ def transform_fact_data(input_file_path: str, output_file_path: str):
     cu_fact_data_df[['assets', 'deposits']].fillna(0, inplace=True)
     # Save formatted data to new file
     cu_fact_data_df.to_csv(output_file_path)
+    record_rows(len(cu_fact_data_df))
+    record_file(input_file_path)
 
 
+@instrumented('transform.credit_union_dim')
 def transform_dim_data(input_file_path, output_file_path):
     """Formats the csv containing the cu's dimensional data
 
@@ -36,41 +42,85 @@ def transform_dim_data(input_file_path, output_file_path):
                           inplace=True)
     # Save formatted data to new file
     cu_dim_data_df.to_csv(output_file_path)
+    record_rows(len(cu_dim_data_df))
+    record_file(input_file_path)
+
+
+def transform_cu_files(cu_dim_path: str, cu_fact_path: str,
+                       output_dir: str, timestamp: str) -> dict:
+    """Formats the cu dimensional and fact csv files
+
+    Args:
+        cu_dim_path (str): file path to csv containing the cu dimensional data
+        cu_fact_path (str): file path to csv containing the cu fact data
+        output_dir (str): directory to save the formatted files to
+        timestamp (str): suffix for the formatted file names
+
+    Returns:
+        dict: paths of the formatted 'dim' and 'fact' files
+    """
+    formatted = {
+        'dim': os.path.join(output_dir, f'formatted_cu_dim_data_{timestamp}.csv'),
+        'fact': os.path.join(output_dir, f'formatted_cu_fact_data_{timestamp}.csv'),
+    }
+    transform_dim_data(cu_dim_path, formatted['dim'])
+    transform_fact_data(cu_fact_path, formatted['fact'])
+    return formatted
+
+
+@instrumented('load.credit_union_staging')
+def load_cu_files_to_staging(formatted: dict, bucket_name: str = 'alpha-rank-ai-bucket'):
+    """Uploads the formatted cu files to GCS and reloads the staging tables
+
+    Args:
+        formatted (dict): paths of the formatted 'dim' and 'fact' files
+        bucket_name (str): GCS bucket used to persist the files
+    """
+    for kind, table_id in (('dim', 'alpha-rank-ai.financial_institutions.dim_credit_unions_staging'),
+                           ('fact', 'alpha-rank-ai.financial_institutions.fact_credit_unions_staging')):
+        blob_name = os.path.basename(formatted[kind])
+        # Upload file to GCS bucket to persist it
+        upload_file_to_gcs(bucket_name, formatted[kind], blob_name)
+        # Truncate staging table before repopulating
+        truncate_table(table_id)
+        write_csv_to_big_query_table(table_id, f'gs://{bucket_name}/{blob_name}',
+                                     autodetect=False)
 
 
 def main():
-    CURRENT_TIMESTAMP = datetime.now().timestamp()
-    BUCKET_NAME = 'alpha-rank-ai-bucket'
-    CU_DIM_OUTPUT_PATH = f'formatted_cu_dim_data_{CURRENT_TIMESTAMP}.csv'
-    CU_FACT_OUTPUT_PATH = f'formatted_cu_fact_data_{CURRENT_TIMESTAMP}.csv'
-    LATEST_CU_DIM_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'cu_dim_data*.csv')
-    LATEST_CU_FACT_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'cu_fact_data*.csv')
-    LATEST_FORMATTED_CU_DIM_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'formatted_cu_dim_data.csv*.csv')
-    LATEST_FORMATTED_CU_FACT_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'formatted_cu_fact_data.csv*.csv')
-
-    # Format the data files
-    transform_dim_data(LATEST_CU_DIM_FILE_PATH,
-                       CU_DIM_OUTPUT_PATH)
-    transform_fact_data(LATEST_CU_FACT_FILE_PATH,
-                        CU_FACT_OUTPUT_PATH)
-
-    # Upload files to GCS bucket to persist files
-    upload_file_to_gcs(BUCKET_NAME, LATEST_FORMATTED_CU_DIM_FILE_PATH,
-                       CU_DIM_OUTPUT_PATH)
-    upload_file_to_gcs(BUCKET_NAME, LATEST_FORMATTED_CU_FACT_FILE_PATH,
-                       CU_FACT_OUTPUT_PATH)
-
-    # Truncate cu dim data staging table before repopulating
-    truncate_table('alpha-rank-ai.financial_institutions.dim_credit_unions_staging')
-    write_csv_to_big_query_table('alpha-rank-ai.financial_institutions.dim_credit_unions_staging', 
-                                 f'gs://{BUCKET_NAME}/{LATEST_FORMATTED_CU_DIM_FILE_PATH}',
-                                 autodetect=False)
-
-    # Truncate cu fact data staging table before repopulating
-    truncate_table('alpha-rank-ai.financial_institutions.fact_credit_unions_staging')
-    write_csv_to_big_query_table('alpha-rank-ai.financial_institutions.fact_credit_unions_staging',
-                                 f'gs://{BUCKET_NAME}/{LATEST_FORMATTED_CU_FACT_FILE_PATH}',
-                                 autodetect=False)
+    with pipeline_run('transform_cu_data'):
+        CURRENT_TIMESTAMP = datetime.now().timestamp()
+        BUCKET_NAME = 'alpha-rank-ai-bucket'
+        CU_DIM_OUTPUT_PATH = f'formatted_cu_dim_data_{CURRENT_TIMESTAMP}.csv'
+        CU_FACT_OUTPUT_PATH = f'formatted_cu_fact_data_{CURRENT_TIMESTAMP}.csv'
+        LATEST_CU_DIM_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'cu_dim_data*.csv')
+        LATEST_CU_FACT_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'cu_fact_data*.csv')
+        LATEST_FORMATTED_CU_DIM_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'formatted_cu_dim_data.csv*.csv')
+        LATEST_FORMATTED_CU_FACT_FILE_PATH = get_latest_file('/Users/imranmahmood/Projects/alpha-rank-ai', 'formatted_cu_fact_data.csv*.csv')
+
+        # Format the data files
+        transform_dim_data(LATEST_CU_DIM_FILE_PATH,
+                           CU_DIM_OUTPUT_PATH)
+        transform_fact_data(LATEST_CU_FACT_FILE_PATH,
+                            CU_FACT_OUTPUT_PATH)
+
+        # Upload files to GCS bucket to persist files
+        upload_file_to_gcs(BUCKET_NAME, LATEST_FORMATTED_CU_DIM_FILE_PATH,
+                           CU_DIM_OUTPUT_PATH)
+        upload_file_to_gcs(BUCKET_NAME, LATEST_FORMATTED_CU_FACT_FILE_PATH,
+                           CU_FACT_OUTPUT_PATH)
+
+        # Truncate cu dim data staging table before repopulating
+        truncate_table('alpha-rank-ai.financial_institutions.dim_credit_unions_staging')
+        write_csv_to_big_query_table('alpha-rank-ai.financial_institutions.dim_credit_unions_staging', 
+                                     f'gs://{BUCKET_NAME}/{LATEST_FORMATTED_CU_DIM_FILE_PATH}',
+                                     autodetect=False)
+
+        # Truncate cu fact data staging table before repopulating
+        truncate_table('alpha-rank-ai.financial_institutions.fact_credit_unions_staging')
+        write_csv_to_big_query_table('alpha-rank-ai.financial_institutions.fact_credit_unions_staging',
+                                     f'gs://{BUCKET_NAME}/{LATEST_FORMATTED_CU_FACT_FILE_PATH}',
+                                     autodetect=False)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The backend and the pipeline scripts import their modules by bare name
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in ('llm/backend', 'scripts'):
+    sys.path.insert(0, os.path.join(REPO_ROOT, path))
@@ -0,0 +1,58 @@
+import pytest
+from cost_guard import DATASET_ID, add_latest_quarter_filters, add_row_limit
+
+
+def narrowed(table, alias):
+    return (f"(SELECT * FROM `{DATASET_ID}.{table}` "
+            f"WHERE year = 2024 AND month = 12) AS {alias}")
+
+
+@pytest.mark.parametrize('sql, expected', [
+    # Unaliased: the table name stays usable as a qualifier
+    ('SELECT * FROM fact_banks WHERE fact_banks.assets > 1',
+     f"SELECT * FROM {narrowed('fact_banks', 'fact_banks')} WHERE fact_banks.assets > 1"),
+    ('SELECT * FROM fact_banks',
+     f"SELECT * FROM {narrowed('fact_banks', 'fact_banks')}"),
+    # Aliased, with and without AS, and fully qualified
+    ('SELECT * FROM fact_banks f WHERE f.assets > 1',
+     f"SELECT * FROM {narrowed('fact_banks', 'f')} WHERE f.assets > 1"),
+    (f'SELECT * FROM `{DATASET_ID}.fact_credit_unions` AS cu',
+     f"SELECT * FROM {narrowed('fact_credit_unions', 'cu')}"),
+    # JOIN followed directly by its ON clause
+    ('SELECT d.name FROM dim_banks d JOIN fact_banks ON d.charter_id = fact_banks.charter_id',
+     f"SELECT d.name FROM dim_banks d JOIN {narrowed('fact_banks', 'fact_banks')} "
+     f"ON d.charter_id = fact_banks.charter_id"),
+    # CTE
+    ('WITH big AS (SELECT charter_id FROM fact_credit_unions WHERE assets > 1) '
+     'SELECT COUNT(*) FROM big',
+     f"WITH big AS (SELECT charter_id FROM {narrowed('fact_credit_unions', 'fact_credit_unions')} "
+     f"WHERE assets > 1) SELECT COUNT(*) FROM big"),
+])
+def test_fact_tables_are_narrowed_to_the_quarter(sql, expected):
+    assert add_latest_quarter_filters(sql, 2024, 12) == expected
+
+
+@pytest.mark.parametrize('sql', [
+    # Tables whose names only start with a fact table name
+    'SELECT * FROM fact_banks_staging',
+    f'SELECT * FROM `{DATASET_ID}.fact_credit_unions_staging` AS s',
+    # The query already picks its own period
+    'SELECT year, SUM(assets) FROM fact_banks GROUP BY year',
+])
+def test_other_queries_are_left_alone(sql):
+    assert add_latest_quarter_filters(sql, 2024, 12) == sql
+
+
+@pytest.mark.parametrize('sql, expected', [
+    ('SELECT * FROM dim_banks', 'SELECT * FROM dim_banks\nLIMIT 100'),
+    ('SELECT * FROM dim_banks LIMIT 5;', 'SELECT * FROM dim_banks LIMIT 5'),
+    ('SELECT * FROM dim_banks LIMIT 50000', 'SELECT * FROM dim_banks LIMIT 100'),
+    ('SELECT * FROM dim_banks LIMIT 50000 OFFSET 10',
+     'SELECT * FROM dim_banks LIMIT 100 OFFSET 10'),
+    # A LIMIT inside a subquery does not bound the result
+    ('SELECT * FROM (SELECT * FROM dim_banks LIMIT 5) AS d JOIN fact_banks f USING (charter_id)',
+     'SELECT * FROM (SELECT * FROM dim_banks LIMIT 5) AS d JOIN fact_banks f USING (charter_id)\n'
+     'LIMIT 100'),
+])
+def test_row_limit(sql, expected):
+    assert add_row_limit(sql, 100) == expected
@@ -0,0 +1,44 @@
+import pytest
+from fast_path import route_question
+
+
+@pytest.mark.parametrize('question', [
+    # An asset threshold the state totals cannot apply
+    'How many banks in TX have over $1B in assets?',
+    'how many banks have over $1b in assets by state',
+    # More than one period
+    'how many banks were there in 2023 vs 2024',
+    'how many banks in Q1 2024 vs Q2 2024',
+    # Not a state code
+    'how many banks are in US',
+    # Amounts outside the asset-range branch
+    'how many banks by asset tier over $1b',
+    'how many banks have $1b',
+    # Unknown words change the meaning
+    'How many banks are in Texas?',
+])
+def test_questions_the_summaries_cannot_answer_go_to_the_llm(question):
+    assert route_question(question) is None
+
+
+def test_state_count_is_routed():
+    sql = route_question('How many banks are in TX?')
+    assert 'summary_state_totals' in sql
+    assert "state = 'TX'" in sql
+
+
+def test_asset_threshold_is_routed_to_asset_tiers():
+    sql = route_question('How many banks have over $1B in assets?')
+    assert 'summary_asset_tiers' in sql
+    assert 'min_assets >= 1000000000' in sql
+
+
+def test_single_year_selects_its_latest_quarter():
+    sql = route_question('how many banks were there in 2023')
+    assert 'summary_institution_counts' in sql
+    assert 'WHERE year = 2023' in sql
+
+
+def test_explicit_quarter_is_used():
+    sql = route_question('total deposits by state in Q3 2024')
+    assert 'year = 2024 AND month = 9' in sql
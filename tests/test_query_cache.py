@@ -0,0 +1,12 @@
+from query_cache import QueryCache
+
+
+def test_discard_reclassifies_hit_as_miss():
+    cache = QueryCache()
+    cache.put('How many banks?', 'SELECT 1', {'job_id': 'job'})
+    assert cache.get('how many banks') is not None
+    cache.discard('how many banks')
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (0, 1, 0)
+    assert cache.get('how many banks') is None
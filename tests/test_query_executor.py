@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from query_executor import AsyncQueryExecutor
+
+
+def test_identical_requests_share_one_run():
+    calls = []
+
+    def work(value):
+        calls.append(value)
+        time.sleep(0.05)
+        return value * 2
+
+    async def main():
+        executor = AsyncQueryExecutor(max_concurrency=2, timeout_seconds=5)
+        results = await asyncio.gather(*(executor.run('key', work, 21) for _ in range(3)))
+        return executor, results
+
+    executor, results = asyncio.run(main())
+    assert results == [42, 42, 42]
+    assert calls == [21]
+    assert executor.stats()['deduplicated'] == 2
+    assert executor.stats()['in_flight'] == 0
+
+
+def test_timeout_raises_and_forgets_the_request():
+    release = threading.Event()
+
+    async def main():
+        executor = AsyncQueryExecutor(max_concurrency=1, timeout_seconds=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await executor.run('key', release.wait)
+        stats = executor.stats()
+        release.set()
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats['timeouts'] == 1
+    assert stats['cancelled'] == 1
+    # A request already on a thread keeps running but new callers do not join it
+    assert stats['in_flight'] == 0
+
+
+def test_request_waiting_for_a_slot_is_cancelled_when_abandoned():
+    release = threading.Event()
+    calls = []
+
+    async def main():
+        executor = AsyncQueryExecutor(max_concurrency=1, timeout_seconds=0.05)
+        # Holds the only slot
+        blocker = asyncio.ensure_future(executor.run('blocker', release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await executor.run('queued', calls.append, 'ran')
+        release.set()
+        with pytest.raises(asyncio.TimeoutError):
+            await blocker
+        # Give a leaked task the chance to take the freed slot
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert calls == []
+
+
+def test_one_caller_timing_out_does_not_cancel_for_the_others():
+    async def main():
+        executor = AsyncQueryExecutor(max_concurrency=1, timeout_seconds=5)
+        patient = asyncio.ensure_future(executor.run('key', time.sleep, 0.1))
+        await asyncio.sleep(0)
+        executor.timeout_seconds = 0.01
+        with pytest.raises(asyncio.TimeoutError):
+            await executor.run('key', time.sleep, 0.1)
+        return executor, await patient
+
+    executor, result = asyncio.run(main())
+    assert result is None
+    assert executor.stats()['cancelled'] == 0